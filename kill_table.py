@@ -0,0 +1,150 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import numpy as np
+import melee_data
+import melee_physics
+import stick_and_di
+
+STAGES = {'example': melee_physics.EXAMPLE_STAGE}
+
+DI_CHOICES = ('none', 'in', 'out')
+
+SHARD_VERSION = 1  # Increase when the physics behind a shard changes, so that saved shards are recomputed
+
+
+def get_di_choice(kb_angle, choice):
+    """Takes in a knockback angle and one of DI_CHOICES.
+    Returns the DI input as a tuple (x, y) in the integer Melee representation after dead zones.
+    'none' is no DI, while 'in' and 'out' are the strongest DI from get_optimal_di that rotates the launch towards
+    and away from the stage respectively, meaning the one that gives the launch the smaller or larger horizontal
+    component in the direction the hit sends. Hits sending straight up or down are treated as sending to the right.
+    """
+    if choice == 'none':
+        return 0, 0
+    (cw_raw, cw_change), (acw_raw, acw_change) = stick_and_di.get_optimal_di(kb_angle)
+    outwards = -1 if np.cos(np.deg2rad(kb_angle)) < -1e-9 else 1
+    cw_outwards = outwards * np.cos(np.deg2rad(kb_angle + cw_change))
+    acw_outwards = outwards * np.cos(np.deg2rad(kb_angle + acw_change))
+    if (choice == 'in') == (cw_outwards < acw_outwards):
+        return stick_and_di.process_raw_input(*cw_raw)
+    return stick_and_di.process_raw_input(*acw_raw)
+
+
+def _shard_key(character, hitbox, characters, hitboxes, stages, di_choices, max_percent):
+    """Returns a short hash of everything the shard for a character and hitbox depends on."""
+    key = {'version': SHARD_VERSION,
+           'character': melee_data.as_dict(melee_data.get_by_name(characters, character)),
+           'hitbox': melee_data.as_dict(melee_data.get_by_name(hitboxes, hitbox)),
+           'stages': stages,
+           'di_choices': list(di_choices),
+           'max_percent': max_percent}
+    key = json.dumps(key, sort_keys=True, default=float)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _shard_filename(parts_dir, character, hitbox, key):
+    """Returns the path of the saved shard for a character and hitbox with the given key from _shard_key, so that a
+    shard computed with different inputs is never reused.
+    """
+    return os.path.join(parts_dir, f'{character}__{hitbox}__{key}.npz')
+
+
+def compute_shard(character, hitbox, characters, hitboxes, stages, di_choices, max_percent):
+    """Computes the kill percents for one character against one hitbox, named in the character and hitbox tables from
+    melee_data, for every DI choice and stage.
+    Returns a dictionary of columns with one row per (DI choice, stage) pair.
+    """
+    char = melee_data.as_dict(melee_data.get_by_name(characters, character))
+    hit = melee_data.as_dict(melee_data.get_by_name(hitboxes, hitbox))
+    di = np.array([get_di_choice(hit['kb_angle'], choice) for choice in di_choices])
+    rows = {'di': [], 'stage': [], 'kill_percent': []}
+    for stage_name, stage in stages.items():
+        kill_percents = melee_physics.get_kill_percents(**hit, **char, di_x=di[:, 0], di_y=di[:, 1],
+                                                        stage=stage, max_percent=max_percent)
+        rows['di'] += list(di_choices)
+        rows['stage'] += [stage_name] * len(di_choices)
+        rows['kill_percent'] += list(kill_percents)
+    return {'character': np.array([character] * len(rows['di'])),
+            'hitbox': np.array([hitbox] * len(rows['di'])),
+            'di': np.array(rows['di']),
+            'stage': np.array(rows['stage']),
+            'kill_percent': np.array(rows['kill_percent'], dtype=np.float64)}
+
+
+def _run_shard(filename, character, hitbox, characters, hitboxes, stages, di_choices, max_percent):
+    """Computes one shard and saves it to filename, so that an interrupted build can be resumed."""
+    columns = compute_shard(character, hitbox, characters, hitboxes, stages, di_choices, max_percent)
+    _save_npz(filename, columns)
+    return character, hitbox
+
+
+def _save_npz(filename, columns):
+    """Saves a dictionary of columns to filename, writing to a temporary file first so that a partially written file
+    is never left behind.
+    """
+    temp_name = filename + '.tmp.npz'
+    np.savez_compressed(temp_name, **columns)
+    os.replace(temp_name, filename)
+
+
+def build_kill_table(filename='kill_table.npz',
+                     characters=None, hitboxes=None, stages=None, di_choices=DI_CHOICES,
+                     max_percent=melee_physics.MAX_PERCENT, max_workers=None):
+    """Computes the kill percent for every character and hitbox in the melee_data tables, which default to the
+    bundled ones, against every DI choice and stage dictionary, and saves the result to filename as
+    an .npz file with the columns character, hitbox, di, stage and kill_percent, where kill_percent is NaN if the hit
+    does not kill by max_percent.
+    Each character and hitbox pair is computed as a separate shard on a process pool, and saved in a directory next
+    to filename as it finishes. Rerunning after an interruption only computes the missing shards. Shards are named
+    with a hash of the character and hitbox stats, stages, DI choices and max_percent, so a shard saved with any of
+    them different is recomputed rather than reused.
+    Returns the dictionary of columns.
+    """
+    characters = melee_data.load_characters() if characters is None else characters
+    hitboxes = melee_data.load_hitboxes() if hitboxes is None else hitboxes
+    stages = STAGES if stages is None else stages
+    parts_dir = filename + '.parts'
+    os.makedirs(parts_dir, exist_ok=True)
+
+    shards = {(c, h): _shard_filename(parts_dir, c, h,
+                                      _shard_key(c, h, characters, hitboxes, stages, di_choices, max_percent))
+              for c in characters['name'] for h in hitboxes['name']}
+    missing = [(c, h) for (c, h), shard in shards.items() if not os.path.exists(shard)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_shard, shards[c, h], c, h, characters, hitboxes, stages, di_choices,
+                                   max_percent)
+                   for c, h in missing]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+
+    parts = []
+    for shard in shards.values():
+        with np.load(shard) as part:
+            parts.append({key: part[key] for key in part.files})
+    columns = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    _save_npz(filename, columns)
+    return columns
+
+
+def load_kill_table(filename='kill_table.npz'):
+    """Returns the dictionary of columns saved by build_kill_table."""
+    with np.load(filename) as table:
+        return {key: table[key] for key in table.files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the kill percent table for every character, hitbox, '
+                                                 'DI choice and stage.')
+    parser.add_argument('filename', nargs='?', default='kill_table.npz')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    columns = build_kill_table(args.filename, max_workers=args.workers)
+    for row in zip(*columns.values()):
+        print(*row)
+
+
+if __name__ == '__main__':
+    main()
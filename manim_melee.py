@@ -1,9 +1,32 @@
+import copy
+import os
+import pickle
+import tempfile
+import manim
+import matplotlib.pyplot as plt
 from manim import *
 import stick_and_di
 import melee_physics
 
 MONOSPACE_FONT = 'monospace'
 INFO_LOCATION = np.array([220, 100, 0])
+GCC_SVG_FILE = os.environ.get('MELEE_ANIM_GCC_SVG',
+                              r'C:\Users\charl\Documents\Python_Projects\manim\GCController_Layout_Modified.svg')
+CONTROL_STICK_TEMPLATE_VERSION = 1  # Increase when ControlStick.build_template changes to rebuild saved templates
+
+
+def complex_to_points(path, out=None):
+    """Takes in a complex numpy array of positions, as returned by melee_physics.get_path, and optionally an (N, 3)
+    float array to write into.
+    Returns an (N, 3) array of points with the real parts as x, the imaginary parts as y and 0 as z.
+    """
+    path = np.asarray(path)
+    if out is None:
+        out = np.empty((len(path), 3))
+    out[:, 0] = path.real
+    out[:, 1] = path.imag
+    out[:, 2] = 0
+    return out
 
 
 class KnockbackTrajectory(CubicBezier):
@@ -22,6 +45,13 @@ class KnockbackTrajectory(CubicBezier):
     def align_points_with_larger(self, larger_mobject):
         CubicBezier.align_points_with_larger(self, larger_mobject)
 
+    PARAMETERS = ('dmg_before_hit',
+                  'kb_angle', 'attack_dmg', 'bkb', 'kbg',
+                  'weight', 'fall_speed', 'gravity',
+                  'di')
+    HITBOX_PARAMETERS = ('kb_angle', 'attack_dmg', 'bkb', 'kbg')
+    CHARACTER_PARAMETERS = ('weight', 'fall_speed', 'gravity')
+
     def __init__(
             self,
             dmg_before_hit=50,
@@ -29,15 +59,6 @@ class KnockbackTrajectory(CubicBezier):
             weight=100, fall_speed=1.8, gravity=0.1,
             di=(0, 0), **kwargs
     ):
-        self.dmg_before_hit = dmg_before_hit
-        self.kb_angle = kb_angle
-        self.attack_dmg = attack_dmg
-        self.bkb = bkb
-        self.kbg = kbg
-        self.weight = weight
-        self.fall_speed = fall_speed
-        self.gravity = gravity
-        self.di = di
         self.path_complex = []
         self.path = np.zeros(1)
         self.recalculate_path(dmg_before_hit,
@@ -46,6 +67,19 @@ class KnockbackTrajectory(CubicBezier):
                               di)
         CubicBezier.__init__(self, self.path, **kwargs)
 
+    @property
+    def points(self):
+        # Changes from the setters are only applied when the points are next read, so that changing several
+        # parameters at once only builds the path once. manim reads points directly when rendering, copying,
+        # aligning and interpolating, so every read goes through here.
+        if self.__dict__.get('dirty'):
+            self.refresh_path()
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+
     def recalculate_path(
             self,
             dmg_before_hit,
@@ -53,6 +87,7 @@ class KnockbackTrajectory(CubicBezier):
             weight, fall_speed, gravity,
             di
     ):
+        self.dirty = False
         self.dmg_before_hit = dmg_before_hit
         self.kb_angle = kb_angle
         self.attack_dmg = attack_dmg
@@ -62,54 +97,146 @@ class KnockbackTrajectory(CubicBezier):
         self.fall_speed = fall_speed
         self.gravity = gravity
         self.di = di
-        self.path_complex = melee_physics.get_path_from_hitbox_char(
+        self.path_complex = melee_physics.get_path_cached(
             dmg_before_hit, kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity, di)
-        self.path = np.array([np.array([p.real, p.imag, 0]) for p in self.path_complex])
-        self.set_points(self.path)
+        # Write into the current points in place when the path length has not changed, to avoid allocating a new
+        # array every frame
+        points = self.__dict__.get('_points')
+        self.path = complex_to_points(self.path_complex,
+                                      out=points if points is not None and len(points) == len(self.path_complex)
+                                      else None)
+        self.points = self.path
+
+    def refresh_path(self):
+        """Recalculates the path if any parameter has changed since it was last calculated. Returns self."""
+        if self.dirty:
+            self.recalculate_path(*(getattr(self, name) for name in self.PARAMETERS))
+        return self
+
+    def set_params(self, **params):
+        """Takes in any of PARAMETERS as keyword arguments and sets them all at once.
+        The path is recalculated when the points are next read.
+        Returns self.
+        """
+        unknown = set(params) - set(self.PARAMETERS)
+        if unknown:
+            raise TypeError(f"Unknown KnockbackTrajectory parameters {sorted(unknown)}")
+        for name, value in params.items():
+            setattr(self, name, value)
+        self.dirty = True
+        return self
+
+    def update(self, dt=0, recursive=True, **params):
+        """Takes in the arguments of Mobject.update, and any of PARAMETERS as keyword arguments which are set at once
+        with set_params before the updaters are applied.
+        """
+        if params:
+            self.set_params(**params)
+        return CubicBezier.update(self, dt, recursive)
 
     def set_dmg_before_hit(self, dmg_before_hit):
-        self.dmg_before_hit = dmg_before_hit
-        self.recalculate_path(self.dmg_before_hit,
-                              self.kb_angle, self.attack_dmg, self.bkb, self.kbg,
-                              self.weight, self.fall_speed, self.gravity,
-                              self.di)
+        return self.set_params(dmg_before_hit=dmg_before_hit)
 
     def set_hitbox(self, **hitbox):
-        if 'kb_angle' in hitbox.keys():
-            self.kb_angle = hitbox['kb_angle']
-        if 'attack_dmg' in hitbox.keys():
-            self.attack_dmg = hitbox['attack_dmg']
-        if 'bkb' in hitbox.keys():
-            self.bkb = hitbox['bkb']
-        if 'kbg' in hitbox.keys():
-            self.kbg = hitbox['kbg']
-        self.recalculate_path(self.dmg_before_hit,
-                              self.kb_angle, self.attack_dmg, self.bkb, self.kbg,
-                              self.weight, self.fall_speed, self.gravity,
-                              self.di)
+        return self.set_params(**{name: hitbox[name] for name in self.HITBOX_PARAMETERS if name in hitbox})
 
     def set_character(self, **character):
-        if 'weight' in character.keys():
-            self.weight = character['weight']
-        if 'fall_speed' in character.keys():
-            self.fall_speed = character['fall_speed']
-        if 'gravity' in character.keys():
-            self.gravity = character['gravity']
-        self.recalculate_path(self.dmg_before_hit,
-                              self.kb_angle, self.attack_dmg, self.bkb, self.kbg,
-                              self.weight, self.fall_speed, self.gravity,
-                              self.di)
+        return self.set_params(**{name: character[name] for name in self.CHARACTER_PARAMETERS if name in character})
 
     def set_di(self, di):
-        self.di = di
-        self.recalculate_path(self.dmg_before_hit,
-                              self.kb_angle, self.attack_dmg, self.bkb, self.kbg,
-                              self.weight, self.fall_speed, self.gravity,
-                              self.di)
+        return self.set_params(di=di)
+
+
+def set_gcc_colours(gcc, main_colour=PURPLE_D):
+    """Colours the parts of the GameCube controller SVGMobject gcc, using main_colour for the casing."""
+    colours = []
+    colours += [GREY, LIGHT_GREY] * 2  # L and R
+    colours += [DARK_BLUE, BLUE]  # Z
+    colours += [BLACK, main_colour] * 6  # CASING Centre, left, right, behind stick,
+    colours += [BLACK, GREY, BLACK]  # GATE
+    colours += [LIGHT_GREY, GREY] * 3  # STICK
+    colours += [LIGHT_GREY]  # more stick
+    colours += [BLACK, YELLOW] * 2  # C STICK
+    colours += [BLACK, main_colour]  # D PAD OUTLINE
+    colours += [GREY, LIGHT_GREY]  # D PAD
+    colours += [GREY] * 5  # D PAD ARROWS
+    colours += [GREY, LIGHT_GREY]  # START
+    colours += [BLACK, main_colour]  # BEHIND BUTTONS
+    colours += [BLACK, GREEN]  # A
+    colours += [BLACK, RED]  # B
+    colours += [BLACK, LIGHT_GREY]  # X
+    colours += [BLACK, LIGHT_GREY]  # Y
+    for s, c in zip(gcc.submobjects, colours):
+        s.set_color(c)
+
+
+def control_stick_template_filename():
+    """Returns the path of the pickled ControlStick template."""
+    return os.path.join(stick_and_di.CACHE_DIR, 'control_stick_template.pickle')
+
+
+def control_stick_template_key():
+    """Returns a tuple of everything a ControlStick template depends on, which is saved alongside it so that a stale
+    template is rebuilt rather than loaded.
+    """
+    svg_mtime = os.path.getmtime(GCC_SVG_FILE) if os.path.exists(GCC_SVG_FILE) else None
+    return (CONTROL_STICK_TEMPLATE_VERSION, manim.__version__, GCC_SVG_FILE, svg_mtime,
+            stick_and_di.INPUT_SIZE, stick_and_di.MAX_MAGNITUDE, stick_and_di.DEAD_ZONE)
+
+
+def _load_cached_pickle(filename, key, build):
+    """Returns the object pickled in filename if it was saved with the same key.
+    Otherwise the object is created by calling build, and pickled to filename along with key under a temporary name
+    which is then moved into place. If it cannot be pickled the built object is returned anyway.
+    """
+    # Any error while loading or saving means the cache is unusable, and the object is simply built instead
+    try:
+        with open(filename, 'rb') as f:
+            saved_key, obj = pickle.load(f)
+        if saved_key == key:
+            return obj
+    except Exception:
+        pass
+    obj = build()
+    temp_name = None
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, obj), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, filename)
+    except Exception:
+        if temp_name is not None and os.path.exists(temp_name):
+            os.remove(temp_name)
+    return obj
 
 
 class ControlStick(VGroup):
+    _template = None
+
     def __init__(self):
+        # Every ControlStick gets its own copy of the template, so they can be changed independently
+        for name, mobject in copy.deepcopy(self.get_template()).items():
+            setattr(self, name, mobject)
+        VGroup.__init__(self, self.backdrops, self.dead_zone_lines, self.dead_zone_group)
+
+    @classmethod
+    def get_template(cls):
+        """Returns the dictionary from build_template.
+        It is built the first time it is needed and pickled to control_stick_template_filename, so that later
+        processes can load it instead of building it again. If the template cannot be saved or loaded it is built
+        each time instead.
+        """
+        if cls._template is None:
+            cls._template = _load_cached_pickle(control_stick_template_filename(), control_stick_template_key(),
+                                                cls.build_template)
+        return cls._template
+
+    @staticmethod
+    def build_template():
+        """Returns a dictionary of the attribute names of a ControlStick to the mobjects making it up, built from
+        scratch.
+        """
         square_edge = stick_and_di.INPUT_SIZE
         input_origin = stick_and_di.ORIGIN
         dead_zone_outside = stick_and_di.DEAD_ZONE  # First value outside dead zone
@@ -130,41 +257,39 @@ class ControlStick(VGroup):
         gcc_svg_init_scale = 4.6  # This scale will make the gate on the gcc svg have unit radius
         gate_arc_radius = 1.15 * input_gate_diameter
 
-        self.square = Square(square_edge, stroke_opacity=0, color=WHITE, fill_opacity=1)
-        self.circle = Circle(radius=circle_radius, color=WHITE, fill_opacity=1, stroke_opacity=0)
+        square = Square(square_edge, stroke_opacity=0, color=WHITE, fill_opacity=1)
+        circle = Circle(radius=circle_radius, color=WHITE, fill_opacity=1, stroke_opacity=0)
         data_color = stick_and_di.possible_inputs_colour()
-        self.blocky_circle = ImageMobject(data_color, height=square_edge)
-        self.gcc = SVGMobject(
-            r'C:\Users\charl\Documents\Python_Projects\manim\GCController_Layout_Modified.svg'
-        ).scale(gcc_svg_init_scale * physical_diameter_as_input / 2)
-        self.gcc_stick_pos = self.gcc.get_center() - self.gcc.submobjects[20].get_center()
-        self.gcc.shift(self.gcc_stick_pos)
-        self.set_gcc_colours()
+        blocky_circle = ImageMobject(data_color, height=square_edge)
+        gcc = SVGMobject(GCC_SVG_FILE).scale(gcc_svg_init_scale * physical_diameter_as_input / 2)
+        gcc_stick_pos = gcc.get_center() - gcc.submobjects[20].get_center()
+        gcc.shift(gcc_stick_pos)
+        set_gcc_colours(gcc)
         nice_gate_points = compass_directions(8) * input_gate_diameter / 2
-        self.nice_gate = ArcPolygon(*nice_gate_points,
-                                    radius=gate_arc_radius,
-                                    color=gate_colour,
-                                    stroke_opacity=1, stroke_width=line_width
-                                    )
+        nice_gate = ArcPolygon(*nice_gate_points,
+                               radius=gate_arc_radius,
+                               color=gate_colour,
+                               stroke_opacity=1, stroke_width=line_width
+                               )
 
         gate_points = [np.array([x - 128, y - 128, 0]) for x, y in zip(stick_and_di.GATE_XS, stick_and_di.GATE_YS)]
         gate_points = gate_points[::-1]
-        self.gate = ArcPolygon(*gate_points,
-                               radius=gate_arc_radius,
-                               color=gate_colour,
-                               stroke_opacity=1,
-                               stroke_width=line_width)
-
-        self.backdrops = VGroup(self.gate, self.circle, self.square, self.gcc)
-        self.dead_zone_xp = DashedLine(dead_zone * RIGHT + input_origin * UP, dead_zone * RIGHT + input_origin * DOWN,
-                                       color=dz_line_colour, stroke_width=line_width)
-        self.dead_zone_xn = DashedLine(dead_zone * LEFT + input_origin * UP, dead_zone * LEFT + input_origin * DOWN,
-                                       color=dz_line_colour, stroke_width=line_width)
-        self.dead_zone_yp = DashedLine(dead_zone * UP + input_origin * LEFT, dead_zone * UP + input_origin * RIGHT,
-                                       color=dz_line_colour, stroke_width=line_width)
-        self.dead_zone_yn = DashedLine(dead_zone * DOWN + input_origin * LEFT, dead_zone * DOWN + input_origin * RIGHT,
-                                       color=dz_line_colour, stroke_width=line_width)
-        self.dead_zone_lines = VGroup(self.dead_zone_xp, self.dead_zone_xn, self.dead_zone_yp, self.dead_zone_yn)
+        gate = ArcPolygon(*gate_points,
+                          radius=gate_arc_radius,
+                          color=gate_colour,
+                          stroke_opacity=1,
+                          stroke_width=line_width)
+
+        backdrops = VGroup(gate, circle, square, gcc)
+        dead_zone_xp = DashedLine(dead_zone * RIGHT + input_origin * UP, dead_zone * RIGHT + input_origin * DOWN,
+                                  color=dz_line_colour, stroke_width=line_width)
+        dead_zone_xn = DashedLine(dead_zone * LEFT + input_origin * UP, dead_zone * LEFT + input_origin * DOWN,
+                                  color=dz_line_colour, stroke_width=line_width)
+        dead_zone_yp = DashedLine(dead_zone * UP + input_origin * LEFT, dead_zone * UP + input_origin * RIGHT,
+                                  color=dz_line_colour, stroke_width=line_width)
+        dead_zone_yn = DashedLine(dead_zone * DOWN + input_origin * LEFT, dead_zone * DOWN + input_origin * RIGHT,
+                                  color=dz_line_colour, stroke_width=line_width)
+        dead_zone_lines = VGroup(dead_zone_xp, dead_zone_xn, dead_zone_yp, dead_zone_yn)
 
         points = {'top left': dead_zone * LEFT + circle_dz * UP,
                   'bottom left': dead_zone * LEFT + circle_dz * DOWN,
@@ -174,54 +299,162 @@ class ControlStick(VGroup):
         arc2 = ArcBetweenPoints(points['bottom left'], points['bottom right'], radius=circle_radius)
         arc3 = ArcBetweenPoints(points['bottom right'], points['top right'], angle=0)
         arc4 = ArcBetweenPoints(points['top right'], points['top left'], radius=circle_radius)
-        self.dead_zone_x = ArcPolygonFromArcs(arc1, arc2, arc3, arc4,
-                                              fill_opacity=dz_opacity, fill_color=dz_colour_x)
-
-        self.flared_dz_x = Polygon(dead_zone * LEFT + circle_dz * UP,
-                                   dead_zone * LEFT + circle_dz * DOWN,
-                                   flared_dz * LEFT + input_origin * DOWN,
-                                   flared_dz * RIGHT + input_origin * DOWN,
-                                   dead_zone * RIGHT + circle_dz * DOWN,
-                                   dead_zone * RIGHT + circle_dz * UP,
-                                   flared_dz * RIGHT + input_origin * UP,
-                                   flared_dz * LEFT + input_origin * UP,
-                                   fill_color=dz_colour_x, fill_opacity=dz_opacity, stroke_opacity=0
-                                   )
-        self.flared_dz_y = self.flared_dz_x.copy().rotate(TAU / 4)
-        self.flared_dz_y.set_color(dz_colour_y)
-        self.dead_zone_y = self.dead_zone_x.copy().rotate(TAU / 4)
-        self.dead_zone_y.set_color(dz_colour_y)
-        self.dead_zone_xy = Rectangle(color=YELLOW, height=dead_zone * 2, width=dead_zone * 2)
-        self.dead_zone_group = VGroup(self.dead_zone_x, self.dead_zone_y, self.flared_dz_x, self.flared_dz_y,
-                                      self.dead_zone_xy)
-
-        VGroup.__init__(self, self.backdrops, self.dead_zone_lines, self.dead_zone_group)
+        dead_zone_x = ArcPolygonFromArcs(arc1, arc2, arc3, arc4,
+                                         fill_opacity=dz_opacity, fill_color=dz_colour_x)
+
+        flared_dz_x = Polygon(dead_zone * LEFT + circle_dz * UP,
+                              dead_zone * LEFT + circle_dz * DOWN,
+                              flared_dz * LEFT + input_origin * DOWN,
+                              flared_dz * RIGHT + input_origin * DOWN,
+                              dead_zone * RIGHT + circle_dz * DOWN,
+                              dead_zone * RIGHT + circle_dz * UP,
+                              flared_dz * RIGHT + input_origin * UP,
+                              flared_dz * LEFT + input_origin * UP,
+                              fill_color=dz_colour_x, fill_opacity=dz_opacity, stroke_opacity=0
+                              )
+        flared_dz_y = flared_dz_x.copy().rotate(TAU / 4)
+        flared_dz_y.set_color(dz_colour_y)
+        dead_zone_y = dead_zone_x.copy().rotate(TAU / 4)
+        dead_zone_y.set_color(dz_colour_y)
+        dead_zone_xy = Rectangle(color=YELLOW, height=dead_zone * 2, width=dead_zone * 2)
+        dead_zone_group = VGroup(dead_zone_x, dead_zone_y, flared_dz_x, flared_dz_y,
+                                 dead_zone_xy)
+
+        return {'square': square,
+                'circle': circle,
+                'blocky_circle': blocky_circle,
+                'gcc': gcc,
+                'gcc_stick_pos': gcc_stick_pos,
+                'nice_gate': nice_gate,
+                'gate': gate,
+                'backdrops': backdrops,
+                'dead_zone_xp': dead_zone_xp,
+                'dead_zone_xn': dead_zone_xn,
+                'dead_zone_yp': dead_zone_yp,
+                'dead_zone_yn': dead_zone_yn,
+                'dead_zone_lines': dead_zone_lines,
+                'dead_zone_x': dead_zone_x,
+                'flared_dz_x': flared_dz_x,
+                'flared_dz_y': flared_dz_y,
+                'dead_zone_y': dead_zone_y,
+                'dead_zone_xy': dead_zone_xy,
+                'dead_zone_group': dead_zone_group}
 
     def set_gcc_colours(self, main_colour=PURPLE_D):
-        colours = []
-        colours += [GREY, LIGHT_GREY] * 2  # L and R
-        colours += [DARK_BLUE, BLUE]  # Z
-        colours += [BLACK, main_colour] * 6  # CASING Centre, left, right, behind stick,
-        colours += [BLACK, GREY, BLACK]  # GATE
-        colours += [LIGHT_GREY, GREY] * 3  # STICK
-        colours += [LIGHT_GREY]  # more stick
-        colours += [BLACK, YELLOW] * 2  # C STICK
-        colours += [BLACK, main_colour]  # D PAD OUTLINE
-        colours += [GREY, LIGHT_GREY]  # D PAD
-        colours += [GREY] * 5  # D PAD ARROWS
-        colours += [GREY, LIGHT_GREY]  # START
-        colours += [BLACK, main_colour]  # BEHIND BUTTONS
-        colours += [BLACK, GREEN]  # A
-        colours += [BLACK, RED]  # B
-        colours += [BLACK, LIGHT_GREY]  # X
-        colours += [BLACK, LIGHT_GREY]  # Y
-        for s, c in zip(self.gcc.submobjects, colours):
-            s.set_color(c)
+        set_gcc_colours(self.gcc, main_colour)
+
+    def get_di_heatmap(self, kb_angle_tracker, **kwargs):
+        """Takes in a ValueTracker holding a knockback angle in degrees, and the keyword arguments of DIHeatmap.
+        Returns a DIHeatmap covering the square of raw inputs, in the same place as blocky_circle.
+        """
+        return DIHeatmap(kb_angle_tracker, height=self.square.height, **kwargs).move_to(self.square)
 
     def align_points_with_larger(self, larger_mobject):
         VGroup.align_points_with_larger(self, larger_mobject)
 
 
+class StickInputState:
+    """Holds a pair of ValueTrackers for the raw x and y coordinates of a stick input, and resolves the raw, processed
+    and dead zone inputs for them from the input table in stick_and_di.
+    The input is only resolved again when the tracker values change, so every dot, line and number showing the input
+    shares a single lookup per frame.
+    """
+    def __init__(self, raw_x_tracker, raw_y_tracker):
+        self.raw_x_tracker = raw_x_tracker
+        self.raw_y_tracker = raw_y_tracker
+        self.tracker_values = None
+        self.raw = None
+        self.raw_point = None
+        self.melee_point = None
+        self.dead_zone_point = None
+        self.refresh()
+
+    def refresh(self):
+        """Resolves the input again if the trackers have changed since the last call. Returns self."""
+        tracker_values = (self.raw_x_tracker.get_value(), self.raw_y_tracker.get_value())
+        if tracker_values == self.tracker_values:
+            return self
+        self.tracker_values = tracker_values
+        raw_x, raw_y = tracker_values
+        # The raw point follows the trackers exactly so that it moves smoothly, while the lookup uses the nearest
+        # integer raw input, which is what the stick can actually produce
+        self.raw_point = np.array([raw_x - stick_and_di.ORIGIN, raw_y - stick_and_di.ORIGIN, 0])
+        raw = tuple(int(min(max(round(v), 0), stick_and_di.INPUT_SIZE - 1)) for v in tracker_values)
+        if raw != self.raw:
+            self.raw = raw
+            entry = stick_and_di.lookup_raw_input(*raw)
+            self.melee_point = np.array([entry['melee_x'], entry['melee_y'], 0], dtype=np.float64)
+            self.dead_zone_point = np.array([entry['x'], entry['y'], 0], dtype=np.float64)
+        return self
+
+    def get_raw(self):
+        """Returns a tuple of the raw x and y inputs, rounded to the nearest integers."""
+        return self.refresh().raw
+
+    def get_raw_point(self):
+        """Returns the raw input as a point relative to the centre of the stick, without rounding."""
+        return self.refresh().raw_point
+
+    def get_melee_point(self):
+        """Returns the processed input, in the integer Melee representation, as a point."""
+        return self.refresh().melee_point
+
+    def get_dead_zone_point(self):
+        """Returns the processed input after dead zones, in the integer Melee representation, as a point."""
+        return self.refresh().dead_zone_point
+
+
+def colormap_lut(cmap):
+    """Takes in the name of a matplotlib colormap.
+    Returns a 256 by 4 uint8 array of its RGBA colours, which an array of uint8 indexes can be looked up in.
+    """
+    return np.rint(plt.get_cmap(cmap)(np.linspace(0, 1, 256)) * 255).astype(np.uint8)
+
+
+class DIHeatmap(ImageMobject):
+    """The DI heatmap from stick_and_di.plot_heat_map as an image of the 256 by 256 raw inputs, following a
+    ValueTracker holding the knockback angle.
+    Frames are read from a memory mapped heatmap tensor rather than calculated, showing the heatmap for the nearest
+    knockback angle in the tensor.
+    """
+    def __init__(self, kb_angle_tracker, sign=False, step=1, filename=None, cmap=None,
+                 height=stick_and_di.INPUT_SIZE, **kwargs):
+        self.kb_angle_tracker = kb_angle_tracker
+        if filename is None:
+            self.tensor, self.kb_angles = stick_and_di.get_heatmap_tensor(sign, step)
+        else:
+            self.tensor, self.kb_angles = stick_and_di.load_heatmap_tensor(filename)
+        # The same colours and limits as plot_heat_map
+        self.lut = colormap_lut(cmap if cmap is not None else 'seismic' if sign else 'jet')
+        self.v_min = -1 if sign else 0
+        self.frame_index = self.get_frame_index()
+        kwargs.setdefault('resampling_algorithm', RESAMPLING_ALGORITHMS['nearest'])
+        ImageMobject.__init__(self, self.get_frame(self.frame_index), **kwargs)
+        self.scale_to_fit_height(height)
+        self.add_updater(lambda mob: mob.refresh_heatmap())
+
+    def get_frame_index(self):
+        """Returns the index into the tensor of the knockback angle nearest to the tracker's value."""
+        return int(np.argmin(stick_and_di.angle_distance(self.kb_angles, self.kb_angle_tracker.get_value())))
+
+    def get_frame(self, index):
+        """Returns the pixel array showing the heatmap at index in the tensor."""
+        heatmap = stick_and_di.decode_heatmap(self.tensor[index])
+        # Binned the same way as matplotlib colormaps, so the colours match plot_heat_map
+        colour_indexes = np.floor((heatmap - self.v_min) / (1 - self.v_min) * 256)
+        colour_indexes = np.clip(colour_indexes, 0, 255).astype(np.uint8)
+        # The heatmap has y increasing with the row, so it is flipped to put y = 0 at the bottom of the image
+        return self.lut[colour_indexes[::-1]]
+
+    def refresh_heatmap(self):
+        """Shows the heatmap for the tracker's current knockback angle, if it is not already shown. Returns self."""
+        frame_index = self.get_frame_index()
+        if frame_index != self.frame_index:
+            self.frame_index = frame_index
+            self.pixel_array = self.get_frame(frame_index)
+        return self
+
+
 class InputScene(MovingCameraScene):
     def __init__(self, **kwargs):
         MovingCameraScene.__init__(self, **kwargs)
@@ -249,10 +482,12 @@ class InputScene(MovingCameraScene):
 
         raw_x = 128  # np.random.randint(255)  # Varies 0-255
         raw_x_tracker = ValueTracker(raw_x)
+        raw_y = 128
+        raw_y_tracker = ValueTracker(raw_y)
+        input_state = StickInputState(raw_x_tracker, raw_y_tracker)
 
         def int2bin(n):
             return format(int(n), "0=08b") + "="
-
         sideways_stick_points = [np.array([-5.3, 0, 0]),
                                  np.array([-5.3, 3.6, 0]),
                                  np.array([-8.15, 3.6, 0]),
@@ -293,7 +528,7 @@ class InputScene(MovingCameraScene):
 
         def get_binary_display():
             return Text(
-                int2bin(raw_x_tracker.get_value()),
+                int2bin(input_state.get_raw()[0]),
                 font=MONOSPACE_FONT,
                 color=x_colour).scale(text_scaling).shift(DOWN * 100 + LEFT * 30)
 
@@ -304,7 +539,7 @@ class InputScene(MovingCameraScene):
         bin_x_display.add_updater(become_binary_display)
 
         raw_x_display = Integer(raw_x, color=x_colour).scale(text_scaling).next_to(bin_x_display, buff=text_buff)
-        raw_x_display.add_updater(lambda m: m.set_value(raw_x_tracker.get_value()))
+        raw_x_display.add_updater(lambda m: m.set_value(input_state.get_raw()[0]))
         raw_x_label = MathTex('x=', color=x_colour).scale(text_scaling).next_to(
             raw_x_display, LEFT, buff=text_buff)
 
@@ -323,22 +558,16 @@ class InputScene(MovingCameraScene):
 
         self.play(x_stuff.animate.move_to(INFO_LOCATION))
 
-        raw_y = 128
-        raw_y_tracker = ValueTracker(raw_y)
         raw_y_label = MathTex('y=',
                               color=y_colour
                               ).scale(text_scaling
                                       ).next_to(bin_x_display, DOWN, buff=text_buff).align_to(bin_x_display, LEFT)
         raw_y_display = Integer(raw_y, color=y_colour).scale(text_scaling).next_to(raw_y_label, RIGHT, buff=text_buff)
-        raw_y_display.add_updater(lambda m: m.set_value(raw_y_tracker.get_value()))
+        raw_y_display.add_updater(lambda m: m.set_value(input_state.get_raw()[1]))
         y_stuff = VGroup(raw_y_label, raw_y_display)
 
         raw_input_dot = Dot(radius=3, color=DARK_GREY, fill_opacity=1)
-        raw_input_dot.add_updater(
-            lambda m: m.move_to(np.array([
-                raw_x_tracker.get_value() - 128,
-                raw_y_tracker.get_value() - 128,
-                0])))
+        raw_input_dot.add_updater(lambda m: m.move_to(input_state.get_raw_point()))
 
         self.play(FadeIn(control_stick.square), FadeInFrom(raw_y_display, UP), FadeInFrom(raw_y_label, UP))
         control_stick.blocky_circle.set(height=stick_and_di.INPUT_SIZE)
@@ -381,12 +610,8 @@ class InputScene(MovingCameraScene):
         melee_label = Tex(r'Processed\\Input',
                           color=melee_colour).scale(text_scaling).next_to(raw_label, DOWN, buff=label_gap)
 
-        def get_melee_input():
-            m_x, m_y = stick_and_di.raw_to_melee(raw_x_tracker.get_value(), raw_y_tracker.get_value())
-            return np.array([m_x, m_y, 0])
-
         melee_input_dot = Dot(radius=3, color=melee_colour, fill_opacity=0)
-        melee_input_dot.add_updater(lambda m: m.move_to(get_melee_input()))
+        melee_input_dot.add_updater(lambda m: m.move_to(input_state.get_melee_point()))
 
         melee_label_x = MathTex('x =',
                                 color=x_colour
@@ -399,8 +624,8 @@ class InputScene(MovingCameraScene):
                                 color=y_colour).scale(text_scaling).next_to(melee_label_x, DOWN, text_buff)
         melee_input_display_y = Integer(color=y_colour, include_sign=True
                                         ).scale(text_scaling).next_to(melee_label_y, RIGHT, buff=text_buff)
-        melee_input_display_x.add_updater(mxu := lambda m: m.set_value(melee_input_dot.get_center()[0]))
-        melee_input_display_y.add_updater(myu := lambda m: m.set_value(melee_input_dot.get_center()[1]))
+        melee_input_display_x.add_updater(mxu := lambda m: m.set_value(input_state.get_melee_point()[0]))
+        melee_input_display_y.add_updater(myu := lambda m: m.set_value(input_state.get_melee_point()[1]))
 
         self.play(Write(VGroup(raw_label, melee_label,
                                melee_label_x, melee_input_display_x,
@@ -411,9 +636,10 @@ class InputScene(MovingCameraScene):
         animate_xy()
 
         self.wait(2)
-        raw_input_line = Line(start=ORIGIN, end=raw_input_dot.get_center(),
+        raw_input_line = Line(start=ORIGIN, end=input_state.get_raw_point(),
                               color=DARK_GREY, stroke_width=line_width, stroke_opacity=1)
-        raw_input_line.add_updater(lambda m: m.put_start_and_end_on(ORIGIN, 0.01 * UP + raw_input_dot.get_center()))
+        raw_input_line.add_updater(
+            lambda m: m.put_start_and_end_on(ORIGIN, 0.01 * UP + input_state.get_raw_point()))
 
         animate_xy(200, 150)
         self.play(ShowCreation(raw_input_line))
@@ -436,8 +662,8 @@ class InputScene(MovingCameraScene):
                                              ).scale(text_scaling).next_to(melee_label_x, buff=text_buff)
         unit_melee_display_y = DecimalNumber(0, color=y_colour, num_decimal_places=4, include_sign=True
                                              ).scale(text_scaling).next_to(melee_label_y, buff=text_buff)
-        unit_melee_display_x.add_updater(lambda m: m.set_value(melee_input_dot.get_center()[0] / 80))
-        unit_melee_display_y.add_updater(lambda m: m.set_value(melee_input_dot.get_center()[1] / 80))
+        unit_melee_display_x.add_updater(lambda m: m.set_value(input_state.get_melee_point()[0] / 80))
+        unit_melee_display_y.add_updater(lambda m: m.set_value(input_state.get_melee_point()[1] / 80))
         dummy_transform_x = Dot().move_to(melee_input_display_x)
         dummy_transform_y = Dot().move_to(melee_input_display_y)
 
@@ -482,18 +708,19 @@ class DeadZoneScene(MovingCameraScene):
 
         raw_x = 128
         raw_x_tracker = ValueTracker(raw_x)
+        raw_y = 128
+        raw_y_tracker = ValueTracker(raw_y)
+        input_state = StickInputState(raw_x_tracker, raw_y_tracker)
         raw_x_display = Integer(raw_x, color=x_colour).scale(text_scaling)
-        raw_x_display.add_updater(lambda m: m.set_value(raw_x_tracker.get_value()))
+        raw_x_display.add_updater(lambda m: m.set_value(input_state.get_raw()[0]))
         raw_x_label = MathTex('x=', color=x_colour).scale(text_scaling).next_to(
             raw_x_display, LEFT, buff=text_buff)
         x_stuff = VGroup(raw_x_label, raw_x_display)
         x_stuff.move_to(INFO_LOCATION)
 
-        raw_y = 128
-        raw_y_tracker = ValueTracker(128)
         raw_y_label = MathTex('y=', color=y_colour).scale(text_scaling).next_to(raw_x_label, DOWN, buff=text_buff)
         raw_y_display = Integer(raw_y, color=y_colour).scale(text_scaling).next_to(raw_y_label, RIGHT, buff=text_buff)
-        raw_y_display.add_updater(lambda m: m.set_value(raw_y_tracker.get_value()))
+        raw_y_display.add_updater(lambda m: m.set_value(input_state.get_raw()[1]))
         y_stuff = VGroup(raw_y_label, raw_y_display)
 
         def animate_xy(x=128, y=128, random=False, **kwargs):
@@ -504,14 +731,11 @@ class DeadZoneScene(MovingCameraScene):
                 raw_y_tracker.animate.set_value(target_y), **kwargs)
 
         raw_input_dot = Dot(radius=3, color=DARK_GREY, fill_opacity=1)
-        raw_input_dot.add_updater(
-            lambda m: m.move_to(np.array([
-                raw_x_tracker.get_value() - 128,
-                raw_y_tracker.get_value() - 128,
-                0])))
-        raw_input_line = Line(start=ORIGIN, end=0.01 * UP + raw_input_dot.get_center(),
+        raw_input_dot.add_updater(lambda m: m.move_to(input_state.get_raw_point()))
+        raw_input_line = Line(start=ORIGIN, end=0.01 * UP + input_state.get_raw_point(),
                               color=DARK_GREY, stroke_width=line_width, stroke_opacity=1)
-        raw_input_line.add_updater(lambda m: m.put_start_and_end_on(ORIGIN, 0.01 * UP + raw_input_dot.get_center()))
+        raw_input_line.add_updater(
+            lambda m: m.put_start_and_end_on(ORIGIN, 0.01 * UP + input_state.get_raw_point()))
 
         raw_label = Tex('Raw Input',
                         color=raw_colour
@@ -522,12 +746,8 @@ class DeadZoneScene(MovingCameraScene):
         melee_label = Tex(r'Processed\\Input',
                           color=melee_colour).scale(text_scaling).next_to(raw_label, DOWN, buff=label_gap)
 
-        def get_melee_input():
-            m_x, m_y = stick_and_di.raw_to_melee(raw_x_tracker.get_value(), raw_y_tracker.get_value())
-            return np.array([m_x, m_y, 0])
-
         melee_input_dot = Dot(radius=3, color=melee_colour, fill_opacity=1)
-        melee_input_dot.add_updater(lambda m: m.move_to(get_melee_input()))
+        melee_input_dot.add_updater(lambda m: m.move_to(input_state.get_melee_point()))
 
         melee_label_x = MathTex('x =',
                                 color=x_colour
@@ -540,17 +760,11 @@ class DeadZoneScene(MovingCameraScene):
                                 color=y_colour).scale(text_scaling).next_to(melee_label_x, DOWN, text_buff)
         melee_input_display_y = DecimalNumber(0, color=y_colour, include_sign=True, num_decimal_places=4
                                               ).scale(text_scaling).next_to(melee_label_y, RIGHT, buff=text_buff)
-        melee_input_display_x.add_updater(lambda m: m.set_value(melee_input_dot.get_center()[0] / 80))
-        melee_input_display_y.add_updater(lambda m: m.set_value(melee_input_dot.get_center()[1] / 80))
-
-        def get_dead_zone_input():
-            m_input = melee_input_dot.get_center()
-            m_x, m_y = m_input[0], m_input[1]
-            dz_x, dz_y = stick_and_di.apply_dead_zone(m_x, m_y)
-            return np.array([dz_x, dz_y, 0])
+        melee_input_display_x.add_updater(lambda m: m.set_value(input_state.get_melee_point()[0] / 80))
+        melee_input_display_y.add_updater(lambda m: m.set_value(input_state.get_melee_point()[1] / 80))
 
         dz_input_dot = Dot(radius=3, color=dz_colour, fill_opacity=1)
-        dz_input_dot.add_updater(lambda m: m.move_to(get_dead_zone_input()))
+        dz_input_dot.add_updater(lambda m: m.move_to(input_state.get_dead_zone_point()))
 
         dz_label = Tex(r'with\\Dead Zone',
                        color=dz_colour).scale(text_scaling).next_to(melee_label, DOWN, buff=label_gap)
@@ -561,13 +775,13 @@ class DeadZoneScene(MovingCameraScene):
         dz_display_x = DecimalNumber(0, num_decimal_places=4,
                                      include_sign=True, color=x_colour
                                      ).scale(text_scaling).next_to(dz_label_x, RIGHT, buff=text_buff)
-        dz_display_x.add_updater(lambda m: m.set_value(dz_input_dot.get_center()[0] / 80))
+        dz_display_x.add_updater(lambda m: m.set_value(input_state.get_dead_zone_point()[0] / 80))
 
         dz_label_y = MathTex(r'y=', color=y_colour).scale(text_scaling).next_to(dz_label_x, DOWN, buff=text_buff)
         dz_display_y = DecimalNumber(0, num_decimal_places=4,
                                      include_sign=True, color=y_colour
                                      ).scale(text_scaling).next_to(dz_label_y, RIGHT, buff=text_buff)
-        dz_display_y.add_updater(lambda m: m.set_value(dz_input_dot.get_center()[1] / 80))
+        dz_display_y.add_updater(lambda m: m.set_value(input_state.get_dead_zone_point()[1] / 80))
 
         dz_text = VGroup(dz_label, dz_label_x, dz_display_x, dz_label_y, dz_display_y)
 
@@ -596,11 +810,11 @@ class DeadZoneScene(MovingCameraScene):
         self.play(FadeIn(control_stick.dead_zone_lines))
 
         arrow_colour = GREY
-        flare_explain_arrow1 = Arrow(start=raw_input_dot.get_center(),
-                                     end=melee_input_dot.get_center(),
+        flare_explain_arrow1 = Arrow(start=input_state.get_raw_point(),
+                                     end=input_state.get_melee_point(),
                                      stroke_width=line_width, stroke_color=arrow_colour)
-        flare_explain_arrow2 = Arrow(start=melee_input_dot.get_center(),
-                                     end=dz_input_dot.get_center(),
+        flare_explain_arrow2 = Arrow(start=input_state.get_melee_point(),
+                                     end=input_state.get_dead_zone_point(),
                                      stroke_width=line_width, stroke_color=arrow_colour)
         flare_explain_arrow1.tip.scale(20)
         flare_explain_arrow2.tip.scale(20)
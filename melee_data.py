@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+CHARACTERS_FILE = os.path.join(DATA_DIR, 'characters.csv')
+HITBOXES_FILE = os.path.join(DATA_DIR, 'hitboxes.csv')
+
+NAME_DTYPE = 'U32'
+CHARACTER_DTYPE = np.dtype([('name', NAME_DTYPE),
+                            ('weight', np.float64),
+                            ('fall_speed', np.float64),
+                            ('gravity', np.float64)])
+HITBOX_DTYPE = np.dtype([('name', NAME_DTYPE),
+                         ('kb_angle', np.float64),
+                         ('attack_dmg', np.float64),
+                         ('bkb', np.float64),
+                         ('kbg', np.float64)])
+
+
+def load_table(filename, dtype):
+    """Takes in the path of a .json file containing a list of objects, or a .csv file with a header row, and a
+    structured numpy dtype whose field names match the keys or columns.
+    Returns a structured numpy array with one element per object or row.
+    """
+    if filename.endswith('.json'):
+        with open(filename) as f:
+            records = json.load(f)
+    elif filename.endswith('.csv'):
+        with open(filename, newline='') as f:
+            records = list(csv.DictReader(f))
+    else:
+        raise ValueError(f"Unknown table format for {filename}, expected .json or .csv")
+    return np.array([tuple(record[field] for field in dtype.names) for record in records], dtype=dtype)
+
+
+def save_table(filename, table):
+    """Saves a structured numpy array to a .json or .csv file that load_table can read."""
+    records = [{field: row[field].item() for field in table.dtype.names} for row in table]
+    if filename.endswith('.json'):
+        with open(filename, 'w') as f:
+            json.dump(records, f, indent=4)
+    elif filename.endswith('.csv'):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=table.dtype.names)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        raise ValueError(f"Unknown table format for {filename}, expected .json or .csv")
+
+
+def load_characters(filename=CHARACTERS_FILE):
+    """Returns the characters in filename as a structured numpy array with dtype CHARACTER_DTYPE."""
+    return load_table(filename, CHARACTER_DTYPE)
+
+
+def load_hitboxes(filename=HITBOXES_FILE):
+    """Returns the hitboxes in filename as a structured numpy array with dtype HITBOX_DTYPE."""
+    return load_table(filename, HITBOX_DTYPE)
+
+
+def get_by_name(table, name):
+    """Returns the element of a character or hitbox table with the given name. Raises KeyError if there is none."""
+    matches = np.flatnonzero(table['name'] == name)
+    if matches.size == 0:
+        raise KeyError(name)
+    return table[matches[0]]
+
+
+def columns(table):
+    """Takes in a character or hitbox table, or a single element of one.
+    Returns a dictionary of its numeric columns, which can be passed as keyword arguments to the physics functions.
+    For example, melee_physics.get_paths_from_hitbox_char(dmg, **columns(hitboxes), **columns(characters[:, None]))
+    simulates every hitbox against every character at once.
+    """
+    return {field: table[field] for field in table.dtype.names if field != 'name'}
+
+
+def as_dict(row):
+    """Takes in a single element of a character or hitbox table.
+    Returns its numeric fields as a dictionary of floats, in the same form as melee_physics.FOX.
+    """
+    return {field: value.item() for field, value in columns(row).items()}
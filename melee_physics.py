@@ -1,3 +1,5 @@
+import collections
+import statistics
 import numpy as np
 import matplotlib.pyplot as plt
 import stick_and_di
@@ -26,13 +28,31 @@ FOX = {'weight': 75,
 
 CURRENT_PERCENT = 100 - EXAMPLE_HITBOX['attack_dmg']
 
+MAX_KNOCKBACK = 2500
+MAX_PERCENT = 999
+STALE_QUEUE_REDUCTIONS = np.array([0.09, 0.08, 0.07, 0.06, 0.05, 0.04, 0.03, 0.02, 0.01])
+
+
+def get_staled_dmg(attack_dmg, stale_queue):
+    """Takes in the damage of an attack and its stale move queue, a boolean array of shape (..., 9) where element i is
+    True if the (i + 1)th most recent move that hit was this attack.
+    Returns the staled damage of the attack, as an array if either argument is an array.
+    """
+    reduction = np.sum(np.asarray(stale_queue, dtype=bool) * STALE_QUEUE_REDUCTIONS, axis=-1)
+    return attack_dmg * (1 - reduction)
+
 
 def get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg=None):
     """Return the knockback strength for a given hitbox on a given character weight. Applies damage before
     calculation
+    Every argument can be a number or an array, and arrays are broadcast against each other so that knockback for
+    many percents, characters and hitboxes comes from one call. If staled_dmg is None, or wherever it is NaN,
+    the attack is treated as fresh. Knockback is capped at MAX_KNOCKBACK.
     """
     if staled_dmg is None:
         staled_dmg = attack_dmg
+    else:
+        staled_dmg = np.where(np.isnan(staled_dmg), attack_dmg, staled_dmg)
     victim_dmg = dmg_before_hit + staled_dmg
     g = kbg / 100
     w = weight / 100
@@ -41,14 +61,13 @@ def get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg=None)
             (1.4 * (attack_dmg + 2) * (staled_dmg + np.floor(victim_dmg)) * (2.0 - (2 * w / (1 + w))) / 20) + 18
     )
 
-    if kb > 2500:
-        kb = 2500
-    return kb
+    return np.minimum(kb, MAX_KNOCKBACK)
 
 
 def get_path(kb_angle, kb_strength, fall_speed, gravity, di=(0, 0)):
     """Takes in a knockback strength and angle, and character stats.
-    Returns a list of complex numbers representing the position of the character getting hit on each frame of hit stun.
+    Returns a numpy array of complex numbers representing the position of the character getting hit on each frame of
+    hit stun, starting with the position 0 before the first frame.
     The real part of tye number is the x position and the imaginary part is the y position.
     A DI input can optionally be provided as a tuple (x, y), where x and y are integers between 0 and 255.
     """
@@ -62,11 +81,296 @@ def get_path(kb_angle, kb_strength, fall_speed, gravity, di=(0, 0)):
     gravity_frames = int(fall_speed / gravity)
     last_gravity_frame = fall_speed % gravity
     hit_stun = int(kb_strength * 0.4)
+    kb_vel_start = kb_strength * 0.03 * unit
+
+    kb_vel_x = _get_kb_velocity(kb_vel_start.real, decay.real, hit_stun)
+    kb_vel_y = _get_kb_velocity(kb_vel_start.imag, decay.imag, hit_stun)
+    fall_velocity = _get_fall_velocity(gravity, gravity_frames, last_gravity_frame, hit_stun)
+
+    positions = np.zeros(hit_stun + 1, dtype=np.complex128)
+    positions.real[1:] = np.cumsum(kb_vel_x)
+    positions.imag[1:] = np.cumsum(fall_velocity + kb_vel_y)
+    return positions
+
+
+def _get_kb_velocity(start, decay, frames):
+    """Takes in one component of the initial knockback velocity and of the decay applied each frame, as numbers or
+    arrays of the same shape.
+    Returns an array of that velocity component on each frame, with the frames along a new last axis. The decay is
+    accumulated frame by frame, and once the component changes sign from its initial value it stays at 0,
+    matching the frame by frame simulation.
+    """
+    start = np.asarray(start)[..., np.newaxis]
+    decay = np.asarray(decay)[..., np.newaxis]
+    steps = np.repeat(-decay, frames + 1, axis=-1)
+    steps[..., :1] = start
+    velocity = np.cumsum(steps, axis=-1)[..., 1:]
+    return np.where(np.sign(velocity) != np.sign(start), 0.0, velocity)
+
+
+def _get_fall_velocity(gravity, gravity_frames, last_gravity_frame, frames):
+    """Takes in a character's gravity, the number of full frames of gravity before reaching their fall speed, and the
+    remaining gravity applied on the frame after that, as numbers or arrays of the same shape.
+    Returns an array of the vertical fall velocity on each frame, with the frames along a new last axis.
+    """
+    gravity = np.asarray(gravity)[..., np.newaxis]
+    gravity_frames = np.asarray(gravity_frames)[..., np.newaxis]
+    last_gravity_frame = np.asarray(last_gravity_frame)[..., np.newaxis]
+    frame = np.arange(frames)
+    acceleration = np.where(frame < gravity_frames, gravity,
+                            np.where(frame == gravity_frames, last_gravity_frame, 0.0))
+    return np.cumsum(-acceleration, axis=-1)
+
+
+def get_paths(kb_angle, kb_strength, fall_speed, gravity, di_x=0, di_y=0, dtype=np.complex128):
+    """Batch version of get_path.
+    Takes in arrays of knockback angles and strengths, character stats and DI inputs in the integer Melee
+    representation, which are broadcast against each other and flattened into N hits.
+    Returns a tuple of 2 elements:
+    (an N by F complex array where each row is the path from get_path for one hit, padded with NaN after the end of
+    hit stun, where F is one more than the longest hit stun,
+    an integer array of the hit stun length of each hit, so that row i is valid up to and including frame hit_stun[i])
+    The paths are simulated in double precision and returned with the given dtype, where np.complex64 halves the
+    memory of large batches.
+    """
+    kb_angle, kb_strength, fall_speed, gravity, di_x, di_y = (
+        np.ravel(a) for a in np.broadcast_arrays(kb_angle, kb_strength, fall_speed, gravity, di_x, di_y))
+    angle_change = stick_and_di.get_di_angle_change_array(kb_angle, di_x, di_y)
+    kb_angle_di = kb_angle + angle_change
+
+    kb_angle_rad = np.deg2rad(kb_angle_di)
+    unit = np.exp(kb_angle_rad * 1j)
+    decay = 0.051 * unit
+
+    gravity_frames = (fall_speed / gravity).astype(int)
+    last_gravity_frame = fall_speed % gravity
+    hit_stun = (kb_strength * 0.4).astype(int)
+    frames = int(hit_stun.max(initial=0))
+    kb_vel_start = kb_strength * 0.03 * unit
+
+    kb_vel_x = _get_kb_velocity(kb_vel_start.real, decay.real, frames)
+    kb_vel_y = _get_kb_velocity(kb_vel_start.imag, decay.imag, frames)
+    fall_velocity = _get_fall_velocity(gravity, gravity_frames, last_gravity_frame, frames)
+
+    positions = np.zeros((kb_angle.size, frames + 1), dtype=np.complex128)
+    positions.real[:, 1:] = np.cumsum(kb_vel_x, axis=-1)
+    positions.imag[:, 1:] = np.cumsum(fall_velocity + kb_vel_y, axis=-1)
+    positions[np.arange(frames + 1) > hit_stun[:, np.newaxis]] = np.nan
+    return positions.astype(dtype, copy=False), hit_stun
+
+
+def get_path_from_hitbox_char(
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        di=(0, 0), staled_dmg=None
+):
+    """Calls get_knockback and get_path using dictionaries representing hit boxes and characters as arguments."""
+    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg)
+    return get_path(kb_angle, kb_strength, fall_speed, gravity, di)
+
+
+class PathCache:
+    """A bounded least recently used cache of paths from get_path_from_hitbox_char.
+    Paths are keyed by the floored victim damage rather than dmg_before_hit, since that is all get_knockback uses,
+    so hits at fractional percents that round down to the same value share one entry.
+    Returned paths are read-only arrays shared between callers.
+    """
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._paths = collections.OrderedDict()
+
+    def get_path(
+            self,
+            dmg_before_hit=50,
+            kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+            weight=100, fall_speed=1.8, gravity=0.1,
+            di=(0, 0), staled_dmg=None
+    ):
+        """Returns get_path_from_hitbox_char for the given arguments, from the cache if possible."""
+        if staled_dmg is None or np.isnan(staled_dmg):
+            staled_dmg = attack_dmg
+        key = (float(np.floor(dmg_before_hit + staled_dmg)), float(staled_dmg),
+               float(kb_angle), float(attack_dmg), float(bkb), float(kbg),
+               float(weight), float(fall_speed), float(gravity),
+               int(di[0]), int(di[1]))
+        path = self._paths.get(key)
+        if path is not None:
+            self.hits += 1
+            self._paths.move_to_end(key)
+            return path
+
+        self.misses += 1
+        path = get_path_from_hitbox_char(dmg_before_hit, kb_angle, attack_dmg, bkb, kbg,
+                                         weight, fall_speed, gravity, (int(di[0]), int(di[1])), staled_dmg)
+        path.flags.writeable = False
+        self._paths[key] = path
+        while len(self._paths) > self.max_size:
+            self._paths.popitem(last=False)
+            self.evictions += 1
+        return path
+
+    def stats(self):
+        """Returns a dictionary of the cache's hits, misses, evictions, current size and maximum size."""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._paths), 'max_size': self.max_size}
+
+    def clear(self):
+        """Empties the cache and resets its statistics."""
+        self._paths.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+PATH_CACHE = PathCache()
+
+
+def get_path_cached(
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        di=(0, 0), staled_dmg=None
+):
+    """Calls get_path_from_hitbox_char through the shared PATH_CACHE. The returned path is a read-only array."""
+    return PATH_CACHE.get_path(dmg_before_hit, kb_angle, attack_dmg, bkb, kbg,
+                               weight, fall_speed, gravity, di, staled_dmg)
+
+
+def get_paths_from_hitbox_char(
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        di_x=0, di_y=0, staled_dmg=None, dtype=np.complex128
+):
+    """Batch version of get_path_from_hitbox_char.
+    Takes in arrays of damage, hitbox and character fields and DI inputs, which are broadcast against each other,
+    and returns the padded paths and hit stun lengths from get_paths.
+    """
+    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg)
+    return get_paths(kb_angle, kb_strength, fall_speed, gravity, di_x, di_y, dtype)
+
+
+def _get_kb_frames(start, decay):
+    """Takes in arrays of one component of the initial knockback velocity and of the decay applied each frame.
+    Returns a float array of the number of frames before that component changes sign and is clamped to 0,
+    which is infinite where it never changes sign.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = start / decay
+    never = np.where(start == 0, 0.0, np.inf)
+    return np.where((decay != 0) & (ratio > 0), np.ceil(ratio) - 1, never)
+
+
+def get_position_at_frame(frame, kb_angle, kb_strength, fall_speed, gravity, di_x=0, di_y=0):
+    """Takes in frame numbers, knockback angles and strengths, character stats and DI inputs in the integer Melee
+    representation, as numbers or arrays which are broadcast against each other.
+    Returns a tuple of complex arrays (position, velocity), where position equals get_path(...)[frame] and velocity is
+    the velocity applied on that frame, or 0 on frame 0. Both are evaluated in closed form without simulating
+    earlier frames, and match get_path to within floating point rounding.
+    Like the padding in get_paths, both are NaN where the frame is outside the hit stun, from 0 to
+    int(kb_strength * 0.4) inclusive.
+    """
+    frame = np.asarray(frame)
+    hit_stun = (np.asarray(kb_strength) * 0.4).astype(int)
+    angle_change = stick_and_di.get_di_angle_change_array(kb_angle, di_x, di_y)
+    kb_angle_di = kb_angle + angle_change
+
+    kb_angle_rad = np.deg2rad(kb_angle_di)
+    unit = np.exp(kb_angle_rad * 1j)
+    decay = 0.051 * unit
+    kb_vel_start = kb_strength * 0.03 * unit
+
+    kb_disp = []
+    kb_vel = []
+    for start, component_decay in ((kb_vel_start.real, decay.real), (kb_vel_start.imag, decay.imag)):
+        # Knockback velocity decays linearly, then stays at 0 once it would change sign
+        moving = np.minimum(frame, _get_kb_frames(start, component_decay))
+        kb_disp.append(moving * start - component_decay * moving * (moving + 1) / 2)
+        kb_vel.append(np.where(frame <= moving, start - frame * component_decay, 0.0))
+
+    fall_disp, fall_vel = _get_fall_motion(frame, fall_speed, gravity)
+
+    position = kb_disp[0] + 1j * (kb_disp[1] + fall_disp)
+    velocity = np.where(frame > 0, kb_vel[0] + 1j * (kb_vel[1] + fall_vel), 0)
+    in_hit_stun = (frame >= 0) & (frame <= hit_stun)
+    return np.where(in_hit_stun, position, np.nan), np.where(in_hit_stun, velocity, np.nan)
+
+
+def _get_fall_motion(frame, fall_speed, gravity):
+    """Takes in frame numbers and character stats as numbers or arrays.
+    Returns a tuple of float arrays (displacement, velocity) in the y direction from gravity alone on each frame.
+    """
+    # Fall velocity grows by gravity each frame, then by the remainder on the frame it reaches fall speed
+    gravity_frames = np.trunc(np.asarray(fall_speed / gravity))
+    last_gravity_frame = fall_speed % gravity
+    terminal_velocity = gravity_frames * gravity + last_gravity_frame
+    falling = np.minimum(frame, gravity_frames)
+    fall_disp = -gravity * falling * (falling + 1) / 2 - np.maximum(frame - gravity_frames, 0) * terminal_velocity
+    fall_vel = np.where(frame <= gravity_frames, -gravity * frame, -terminal_velocity)
+    return fall_disp, fall_vel
+
+
+def get_position_at_frame_from_hitbox_char(
+        frame,
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        di_x=0, di_y=0, staled_dmg=None
+):
+    """Calls get_knockback and get_position_at_frame using dictionaries representing hit boxes and characters as
+    arguments. Every argument can be an array, so that for example frame 30 at every percent is one call.
+    """
+    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg)
+    return get_position_at_frame(frame, kb_angle, kb_strength, fall_speed, gravity, di_x, di_y)
+
+
+def is_outside_blast_zone(position, stage=EXAMPLE_STAGE):
+    """Takes in a position as a complex number, or an array of them, and a stage dictionary with the keys top, bottom,
+    left and right.
+    Returns True, or a boolean array, where the position is past any of the stage's blast zones.
+    """
+    xs = np.real(position)
+    ys = np.imag(position)
+    with np.errstate(invalid='ignore'):  # NaN padding compares as False
+        return (xs < stage['left']) | (xs > stage['right']) | (ys > stage['top']) | (ys < stage['bottom'])
+
+
+def crosses_blast_zone(path, stage=EXAMPLE_STAGE):
+    """Takes in a path from get_path, or a padded array of paths from get_paths, and a stage dictionary with the
+    keys top, bottom, left and right.
+    Returns True, or a boolean array with one element per path, if the path goes past any of the stage's blast zones.
+    """
+    return is_outside_blast_zone(path, stage).any(axis=-1)
+
+
+def iter_path(kb_angle, kb_strength, fall_speed, gravity, di=(0, 0), stage=None, max_frames=None, stop=None):
+    """Generator version of get_path, which simulates one frame at a time so that callers only pay for the frames
+    they use.
+    Yields a tuple (frame, position, velocity) for each frame of hit stun, starting from frame 1, where position
+    equals get_path(...)[frame] and velocity is the complex velocity applied on that frame.
+    Stops early after the first frame past a blast zone if a stage dictionary is given, after max_frames frames,
+    or after the first frame for which stop(frame, position, velocity) returns True.
+    """
+    angle_change = stick_and_di.get_di_angle_change(kb_angle, *di)
+    kb_angle_di = kb_angle + angle_change
+
+    kb_angle_rad = np.deg2rad(kb_angle_di)
+    unit = np.exp(kb_angle_rad * 1j)
+    decay = 0.051 * unit
+
+    gravity_frames = int(fall_speed / gravity)
+    last_gravity_frame = fall_speed % gravity
+    hit_stun = int(kb_strength * 0.4)
+    if max_frames is not None:
+        hit_stun = min(hit_stun, max_frames)
     position = 0 + 0j
     fall_velocity = 0 + 0j
     kb_vel_start = kb_strength * 0.03 * unit
     kb_vel = kb_vel_start.copy()
-    pos_list = [0 + 0j]
     for i in range(hit_stun):
         # Apply decay
         kb_vel -= decay
@@ -80,21 +384,277 @@ def get_path(kb_angle, kb_strength, fall_speed, gravity, di=(0, 0)):
             fall_velocity -= gravity * 1j
         elif i == gravity_frames:
             fall_velocity -= last_gravity_frame * 1j
-        position += fall_velocity + kb_vel
+        velocity = fall_velocity + kb_vel
+        position += velocity
 
-        pos_list.append(position)
-    return pos_list
+        yield i + 1, position, velocity
+        if stage is not None and is_outside_blast_zone(position, stage):
+            return
+        if stop is not None and stop(i + 1, position, velocity):
+            return
 
 
-def get_path_from_hitbox_char(
+def iter_path_from_hitbox_char(
         dmg_before_hit=50,
         kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
         weight=100, fall_speed=1.8, gravity=0.1,
-        di=(0, 0)
+        di=(0, 0), staled_dmg=None,
+        stage=None, max_frames=None, stop=None
 ):
-    """Calls get_knockback and get_path using dictionaries representing hit boxes and characters as arguments."""
-    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg)
-    return get_path(kb_angle, kb_strength, fall_speed, gravity, di)
+    """Calls get_knockback and iter_path using dictionaries representing hit boxes and characters as arguments."""
+    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg)
+    return iter_path(kb_angle, kb_strength, fall_speed, gravity, di, stage, max_frames, stop)
+
+
+def _kills(dmg_before_hit, kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity, di_x, di_y, stage,
+           chunk_size):
+    """Takes in 1 dimensional arrays of the same length describing hits.
+    Returns a boolean array which is True for each hit whose path crosses a blast zone during hit stun.
+    The hits are simulated chunk_size at a time to bound memory use.
+    """
+    kills = np.zeros(dmg_before_hit.size, dtype=bool)
+    for start in range(0, dmg_before_hit.size, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        paths, _ = get_paths_from_hitbox_char(dmg_before_hit[chunk],
+                                              kb_angle[chunk], attack_dmg[chunk], bkb[chunk], kbg[chunk],
+                                              weight[chunk], fall_speed[chunk], gravity[chunk],
+                                              di_x[chunk], di_y[chunk])
+        kills[chunk] = crosses_blast_zone(paths, stage)
+    return kills
+
+
+def get_kill_percents(
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        di_x=None, di_y=None,
+        stage=EXAMPLE_STAGE, max_percent=MAX_PERCENT, chunk_size=1024
+):
+    """Batch version of get_kill_percent.
+    Takes in arrays of hitbox and character fields and DI inputs in the integer Melee representation, which are
+    broadcast against each other.
+    Returns a float array of the lowest integer dmg_before_hit at which each hit crosses a blast zone of stage during
+    hit stun, or NaN where it does not kill by max_percent.
+    If di_x and di_y are None, every DI input is used and the result has two extra trailing axes of length 256,
+    so that the [..., y, x] element is the kill percent when holding the raw input (x, y), like di_heatmap.
+    Knockback increases with percent, so each kill percent is found by a binary search run on every hit at once.
+    """
+    grid = di_x is None and di_y is None
+    if grid:
+        unique, inverse = stick_and_di.get_unique_inputs()
+        di_x, di_y = unique['x'], unique['y']
+        kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity = (
+            np.expand_dims(a, -1) for a in (kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity))
+    else:
+        di_x = 0 if di_x is None else di_x
+        di_y = 0 if di_y is None else di_y
+    arrays = np.broadcast_arrays(kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity, di_x, di_y)
+    shape = arrays[0].shape
+    hits = [np.ravel(a) for a in arrays]
+
+    # Search for the lowest percent that kills between low, which does not kill, and high, which does
+    low = np.full(shape, -1).ravel()
+    high = np.full(shape, max_percent).ravel()
+    active = _kills(high.astype(float), *hits, stage, chunk_size)
+    kill_percent = np.full(low.size, np.nan)
+    while active.any():
+        rows = np.flatnonzero(active)
+        mid = (low[rows] + high[rows]) // 2
+        kills = _kills(mid.astype(float), *(a[rows] for a in hits), stage, chunk_size)
+        high[rows[kills]] = mid[kills]
+        low[rows[~kills]] = mid[~kills]
+        done = high[rows] - low[rows] <= 1
+        kill_percent[rows[done]] = high[rows[done]]
+        active[rows[done]] = False
+
+    kill_percent = kill_percent.reshape(shape)
+    if grid:
+        kill_percent = kill_percent[..., inverse.T]
+    return kill_percent
+
+
+def get_kill_percent(
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        di=(0, 0), stage=EXAMPLE_STAGE, max_percent=MAX_PERCENT
+):
+    """Takes in a hitbox, character stats, a DI input as a tuple (x, y) in the integer Melee representation and a stage
+    dictionary with the keys top, bottom, left and right.
+    Returns the lowest integer dmg_before_hit at which the character crosses a blast zone during hit stun, or None if
+    they survive up to max_percent.
+    """
+    kill_percent = get_kill_percents(kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity, di[0], di[1],
+                                     stage, max_percent)
+    if np.isnan(kill_percent):
+        return None
+    return int(kill_percent)
+
+
+def get_distinct_di(kb_angle):
+    """Takes in a knockback angle.
+    Returns a tuple of 2 elements describing the distinct angle changes that DI inputs can cause:
+    (a sorted array of the distinct angle changes from get_di_angle_change,
+    a structured array from stick_and_di.get_unique_inputs of the first distinct processed input giving each one)
+    """
+    unique, _ = stick_and_di.get_unique_inputs()
+    angle_changes = stick_and_di.get_di_angle_change_array(kb_angle, unique['x'], unique['y'])
+    angle_changes, first = np.unique(angle_changes, return_index=True)
+    return angle_changes, unique[first]
+
+
+def _convex_hull(points):
+    """Takes in an array of complex numbers representing points.
+    Returns the indices of the points on their convex hull in anticlockwise order, using the monotone chain algorithm.
+    """
+    order = np.lexsort((points.imag, points.real))
+
+    def cross(o, a, b):
+        return (a - o).real * (b - o).imag - (a - o).imag * (b - o).real
+
+    def half_hull(indices):
+        hull = []
+        for i in indices:
+            while len(hull) >= 2 and cross(points[hull[-2]], points[hull[-1]], points[i]) <= 0:
+                hull.pop()
+            hull.append(i)
+        return hull
+
+    lower = half_hull(order)
+    upper = half_hull(order[::-1])
+    return np.array(lower[:-1] + upper[:-1] or lower[:1], dtype=np.intp)
+
+
+def get_di_envelope(
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        staled_dmg=None
+):
+    """Takes in a hit in the same form as get_path_from_hitbox_char, without DI.
+    Returns a dictionary describing every position the character can reach on each frame of hit stun with any DI
+    input. Only the distinct angle changes from get_distinct_di are simulated. The dictionary contains:
+    'angle_changes': the distinct DI angle changes,
+    'raw_inputs': an array of shape (len(angle_changes), 2) of a raw input (x, y) giving each angle change,
+    'paths': the path for each angle change, with one row per angle change and one column per frame,
+    'bounds': an array of shape (frames, 4) of the minimum x, maximum x, minimum y and maximum y reached on each frame,
+    'extreme_inputs': an array of shape (frames, 4, 2) of a raw input reaching each of those bounds,
+    'hulls': a list with one array per frame of the row indices of the paths on that frame's convex hull,
+    in anticlockwise order.
+    """
+    angle_changes, inputs = get_distinct_di(kb_angle)
+    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg)
+    paths, _ = get_paths(kb_angle, kb_strength, fall_speed, gravity, inputs['x'], inputs['y'])
+    raw_inputs = np.stack((inputs['raw_x'], inputs['raw_y']), axis=-1)
+
+    extremes = np.stack((np.argmin(paths.real, axis=0), np.argmax(paths.real, axis=0),
+                         np.argmin(paths.imag, axis=0), np.argmax(paths.imag, axis=0)), axis=-1)
+    frames = np.arange(paths.shape[1])[:, np.newaxis]
+    extreme_positions = paths[extremes, frames]
+    bounds = np.stack((extreme_positions[:, 0].real, extreme_positions[:, 1].real,
+                       extreme_positions[:, 2].imag, extreme_positions[:, 3].imag), axis=-1)
+    hulls = [_convex_hull(paths[:, frame]) for frame in range(paths.shape[1])]
+    return {'angle_changes': angle_changes,
+            'raw_inputs': raw_inputs,
+            'paths': paths,
+            'bounds': bounds,
+            'extreme_inputs': raw_inputs[extremes],
+            'hulls': hulls}
+
+
+def get_launch_angle_from_position(position, frame, fall_speed, gravity):
+    """Takes in observed positions as complex numbers relative to where the hit happened, the frames of hit stun they
+    were observed on, and the stats of the character that was hit, as numbers or arrays.
+    Returns the knockback angle after DI, in degrees, that would put the character at each position.
+    Gravity does not depend on DI, so removing its displacement leaves the knockback displacement, which points
+    along the launch angle.
+    """
+    fall_displacement, _ = _get_fall_motion(np.asarray(frame), fall_speed, gravity)
+    return np.rad2deg(np.angle(np.asarray(position) - 1j * fall_displacement))
+
+
+def match_di_from_position(
+        position, frame,
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        staled_dmg=None, tolerance=None
+):
+    """Takes in observed positions as complex numbers relative to where the hit happened and the frames of hit stun
+    they were observed on, as numbers or arrays, and the hit in the same form as get_path_from_hitbox_char.
+    The strength of the hit only changes how far the character travels, so dmg_before_hit, attack_dmg, bkb, kbg,
+    weight and staled_dmg are accepted for convenience but do not affect the result.
+    If tolerance is None, returns an array from stick_and_di.nearest_launch_angle with the input whose launch angle
+    best matches each position. Otherwise position and frame must be single values, and every input whose launch
+    angle is within tolerance degrees is returned.
+    """
+    index = stick_and_di.build_launch_angle_index(kb_angle)
+    launch_angle = get_launch_angle_from_position(position, frame, fall_speed, gravity)
+    if tolerance is None:
+        return stick_and_di.nearest_launch_angle(index, launch_angle)
+    return stick_and_di.inputs_near_launch_angle(index, launch_angle, tolerance)
+
+
+def get_kill_grid(
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        staled_dmg=None, stage=EXAMPLE_STAGE
+):
+    """Takes in a hit in the same form as get_path_from_hitbox_char, without DI, and a stage dictionary.
+    Returns a 256 by 256 boolean array where the [y, x] element is True if the character crosses a blast zone during
+    hit stun when holding the raw input (x, y), like get_kill_percents and di_heatmap. Only the distinct DI angle
+    changes are simulated.
+    """
+    unique, _ = stick_and_di.get_unique_inputs()
+    angle_changes = stick_and_di.get_di_angle_change_array(kb_angle, unique['x'], unique['y'])
+    _, first, inverse = np.unique(angle_changes, return_index=True, return_inverse=True)
+    kb_strength = get_knockback(dmg_before_hit, weight, attack_dmg, bkb, kbg, staled_dmg)
+    paths, _ = get_paths(kb_angle, kb_strength, fall_speed, gravity, unique['x'][first], unique['y'][first])
+    kills = crosses_blast_zone(paths, stage)
+    return stick_and_di.unique_to_grid(kills[inverse.ravel()]).T
+
+
+def get_survival_probability(
+        intended_x, intended_y, stick_noise=5,
+        dmg_before_hit=50,
+        kb_angle=45, attack_dmg=10, bkb=50, kbg=50,
+        weight=100, fall_speed=1.8, gravity=0.1,
+        staled_dmg=None, stage=EXAMPLE_STAGE,
+        samples=100000, seed=None, confidence=0.95, chunk_size=1000000
+):
+    """Estimates how likely a character is to survive a hit when trying to DI with imprecise stick inputs.
+    Takes in intended raw inputs intended_x and intended_y as numbers or arrays, the standard deviation of the
+    player's stick noise in raw input units, and a hit in the same form as get_path_from_hitbox_char.
+    For each intended input, samples raw inputs from a normal distribution around it, rounded to integers and clipped
+    to 0-255, and checks whether each one survives using get_kill_grid.
+    Samples are drawn chunk_size at a time to bound memory use, and the same seed and chunk_size give the same
+    results.
+    Returns a dictionary of arrays with the shape of the intended inputs:
+    'survival': the proportion of samples that survived,
+    'lower' and 'upper': the Wilson score interval for the survival probability at the given confidence level.
+    """
+    intended_x, intended_y = np.broadcast_arrays(intended_x, intended_y)
+    shape = intended_x.shape
+    intended = np.stack((intended_x.ravel(), intended_y.ravel()), axis=-1).astype(np.float64)
+    survives = ~get_kill_grid(dmg_before_hit, kb_angle, attack_dmg, bkb, kbg, weight, fall_speed, gravity,
+                              staled_dmg, stage)
+
+    rng = np.random.default_rng(seed)
+    total = len(intended) * samples
+    survived = np.zeros(len(intended))
+    for start in range(0, total, chunk_size):
+        which = np.arange(start, min(start + chunk_size, total)) // samples
+        raw = intended[which] + rng.normal(0, stick_noise, (which.size, 2))
+        raw = np.clip(np.rint(raw), 0, stick_and_di.INPUT_SIZE - 1).astype(np.intp)
+        survived += np.bincount(which, weights=survives[raw[:, 1], raw[:, 0]], minlength=len(intended))
+
+    # Wilson score interval
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    p = survived / samples
+    centre = (p + z ** 2 / (2 * samples)) / (1 + z ** 2 / samples)
+    half_width = z * np.sqrt(p * (1 - p) / samples + z ** 2 / (4 * samples ** 2)) / (1 + z ** 2 / samples)
+    return {'survival': p.reshape(shape),
+            'lower': np.clip(centre - half_width, 0, 1).reshape(shape),
+            'upper': np.clip(centre + half_width, 0, 1).reshape(shape)}
 
 
 def main():
@@ -1,7 +1,11 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
+import csv
 import fractions
+import itertools
+import os
+import tempfile
 
 INPUT_SIZE = 256
 ORIGIN = INPUT_SIZE // 2
@@ -9,6 +13,7 @@ MAX_MAGNITUDE = 80
 MAX_MAG_SQUARE = 6400
 DEAD_ZONE = 23  # Out of 80, 23 is not included in dead zone
 MAX_DI = 18  # degrees
+HEATMAP_SCALE = 10000  # Heatmaps are rounded to 4 decimal places
 
 GATE_XS = [233, 206, 125, 55, 32, 56, 131, 210, 233]
 GATE_YS = [129, 44, 22, 50, 125, 202, 227, 205, 129]
@@ -19,6 +24,32 @@ input_gate_diameter_mm = 10.9  # GATE_DIAMETER_MM - STICK_STEM_DIAMETER_MM
 mm_to_input = 18.8  # 205 / 10.9
 physical_diameter_as_input = 404  # GATE_DIAMETER_MM * mm_to_input
 
+CACHE_DIR = os.environ.get('MELEE_ANIM_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+INPUT_TABLE_DTYPE = np.dtype([('melee_x', np.int8), ('melee_y', np.int8),  # After raw_to_melee
+                              ('x', np.int8), ('y', np.int8),  # After apply_dead_zone as well
+                              ('rescaled', np.bool_)])  # True if raw_to_melee shortened the input
+UNIQUE_INPUT_DTYPE = np.dtype([('x', np.int8), ('y', np.int8),  # Processed input after dead zones
+                               ('raw_x', np.uint8), ('raw_y', np.uint8),  # First raw input giving this input
+                               ('count', np.int32)])  # Number of raw inputs giving this input
+ANGLE_INDEX_DTYPE = np.dtype([('angle', np.float64),  # Degrees, from xy_to_angle
+                              ('x', np.int8), ('y', np.int8),  # Largest processed input at this angle
+                              ('raw_x', np.uint8), ('raw_y', np.uint8),  # First raw input giving that input
+                              ('rescaled', np.bool_)])  # True if that raw input was shortened by raw_to_melee
+LAUNCH_ANGLE_INDEX_DTYPE = np.dtype([('launch_angle', np.float64),  # Knockback angle after DI, in degrees
+                                     ('angle_change', np.float64),  # From get_di_angle_change
+                                     ('x', np.int8), ('y', np.int8),  # Processed input after dead zones
+                                     ('raw_x', np.uint8), ('raw_y', np.uint8)])  # First raw input giving that input
+STICK_LOG_DTYPE = np.dtype([('frame', np.int64),
+                            ('raw_x', np.uint8), ('raw_y', np.uint8),
+                            ('x', np.int8), ('y', np.int8),  # Processed input after dead zones
+                            ('dead_zone_x', np.bool_), ('dead_zone_y', np.bool_),  # True if the axis was zeroed
+                            ('angle', np.float64),  # Of the processed input, NaN for neutral
+                            ('di_effectiveness', np.float64)])  # Against the knockback angle given to iter_stick_log
+_input_table = None
+_unique_inputs = None
+_unique_input_polar = None
+_angle_indexes = {}
+
 
 def raw_to_melee(x, y):
     """Takes a stick input consisting of two integers x and y that are each between 0 and 255 inclusive.
@@ -96,9 +127,7 @@ def get_di_effectiveness(kb_angle, x, y):
     input_angle = xy_to_angle(x, y)
     if input_angle is None:
         return 0
-    angle_difference = input_angle - kb_angle
-    if angle_difference > 180:
-        angle_difference -= 360
+    angle_difference = _wrap_angle_difference(input_angle - kb_angle)
 
     if isinstance(x, int) and isinstance(y, int):
         x /= MAX_MAGNITUDE
@@ -113,6 +142,18 @@ def get_di_effectiveness(kb_angle, x, y):
     return signed_effectiveness
 
 
+def _wrap_angle_difference(angle_difference):
+    """Takes in a difference between two angles in degrees, or an array of them.
+    Returns the same difference normalised into the range (-180, 180], so that its sign gives the shorter direction
+    around the circle.
+    """
+    angle_difference = np.asarray(angle_difference)
+    # Wrapping conditionally leaves differences already in range untouched, where % 360 could round them
+    wrapped = np.where(angle_difference > 180, angle_difference - 360,
+                       np.where(angle_difference <= -180, angle_difference + 360, angle_difference))
+    return wrapped if wrapped.ndim else wrapped.item()
+
+
 def get_di_angle_change(kb_angle, x, y):
     """Takes in a knockback angle and a DI input in the integer Melee representation
     i.e. each coordinate is between -80 and 80 inclusive, magnitude of the input <= 80
@@ -134,25 +175,417 @@ def get_di_kb_angle(kb_angle, x, y):
     return kb_angle + get_di_angle_change(kb_angle, x, y)
 
 
-def di_heatmap(kb_angle, sign=False):
+def xy_to_angle_array(x, y):
+    """Array version of xy_to_angle.
+    Takes in arrays of coordinates x and y and returns an array of the positive angles in degrees between each vector
+    and the positive x-axis. Where both coordinates are 0 the angle is NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        input_angle = np.rad2deg(np.arctan(y / x))
+    input_angle = np.where(x < 0, input_angle + 180, np.where(y < 0, input_angle + 360, input_angle))
+    on_y_axis = np.where(y > 0, 90.0, np.where(y < 0, 270.0, np.nan))
+    return np.where(x == 0, on_y_axis, input_angle)
+
+
+def get_di_effectiveness_array(kb_angle, x, y):
+    """Array version of get_di_effectiveness.
+    Takes in knockback angles and DI inputs in the integer Melee representation as arrays, which are broadcast
+    against each other. This function does not apply dead zones, use apply_dead_zone_array first.
+    Returns an array of the signed DI effectiveness. This matches calling get_di_effectiveness on each input to within
+    the last bit, as numpy squares arrays exactly where Python's ** uses the C pow function.
+    """
+    input_angle, input_mag = _input_polar(x, y)
+    return _effectiveness_from_polar(kb_angle, input_angle, input_mag)
+
+
+def _input_polar(x, y):
+    """Takes in arrays of DI inputs in the integer Melee representation.
+    Returns a tuple of arrays containing the angle of each input from xy_to_angle_array and its magnitude as a
+    proportion of MAX_MAGNITUDE.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    input_angle = xy_to_angle_array(x, y)
+    x = x / MAX_MAGNITUDE
+    y = y / MAX_MAGNITUDE
+    input_mag = (x ** 2 + y ** 2) ** 0.5
+    return input_angle, input_mag
+
+
+def _effectiveness_from_polar(kb_angle, input_angle, input_mag):
+    """Returns the signed DI effectiveness for DI inputs given by the angles and magnitudes from _input_polar."""
+    angle_difference = _wrap_angle_difference(input_angle - kb_angle)
+    p_distance_squared = (np.sin(np.deg2rad(angle_difference)) * input_mag) ** 2
+    signed_effectiveness = p_distance_squared * np.sign(angle_difference)
+    return np.where(np.isnan(input_angle), 0.0, signed_effectiveness)
+
+
+def get_di_angle_change_array(kb_angle, x, y):
+    """Array version of get_di_angle_change.
+    Returns an array of the angle changes to the knockback caused by each DI input.
+    """
+    return get_di_effectiveness_array(kb_angle, x, y) * MAX_DI
+
+
+def di_heatmap(kb_angle, sign=False, dtype=np.float64):
     """Takes in a knockback angle, and an optional boolean to determine whether to include the sign on the output.
-    Returns a 256 by 256 numpy array where the [x, y] element of the array is the effectiveness of the DI, as a
+    Returns a 256 by 256 numpy array where the [y, x] element of the array is the effectiveness of the DI, as a
     proportion of the maximum 18 degrees, for the raw input (x, y) when kb_angle is applied.
+    The array is stored with the given dtype using encode_heatmap, where np.float32 or np.int16 give a compact
+    array that decode_heatmap converts back.
     """
-    n = INPUT_SIZE
-    raw_input = [[(0, 0) for _ in range(n)] for __ in range(n)]
-    melee_input = raw_input.copy()
-    dz_input = raw_input.copy()
-    heatmap = np.zeros((n, n))
-    for x in range(n):
-        for y in range(n):
-            raw_input[x][y] = (x, y)
-            melee_input[x][y] = raw_to_melee(x, y)
-            dz_input[x][y] = apply_dead_zone(*melee_input[x][y])
-            heatmap[y, x] = get_di_effectiveness(kb_angle, *dz_input[x][y])
+    unique, inverse = get_unique_inputs()
+    effectiveness = get_di_effectiveness_array(kb_angle, unique['x'], unique['y'])
     if not sign:
-        heatmap = np.abs(heatmap)
-    return np.round(heatmap, 4)
+        effectiveness = np.abs(effectiveness)
+    return encode_heatmap(np.round(effectiveness, 4), dtype)[inverse.T]
+
+
+def di_heatmap_tensor(kb_angles, sign=False, out=None, chunk_size=64, dtype=np.float64):
+    """Takes in an array of knockback angles, and an optional boolean to determine whether to include the sign on the
+    output.
+    Returns an array of shape (len(kb_angles), 256, 256) where the [i] element is di_heatmap(kb_angles[i], sign).
+    The heatmaps are calculated chunk_size angles at a time and written into out if it is given, which can be a
+    memory mapped array for sweeps too large to hold in memory. The heatmaps are encoded with the dtype of out if it
+    is given, or dtype otherwise.
+    """
+    kb_angles = np.asarray(kb_angles, dtype=np.float64).ravel()
+    if out is None:
+        out = np.empty((kb_angles.size, INPUT_SIZE, INPUT_SIZE), dtype=dtype)
+    unique, inverse = get_unique_inputs()
+    inverse_yx = inverse.T
+    for start in range(0, kb_angles.size, chunk_size):
+        angles = kb_angles[start:start + chunk_size, np.newaxis]
+        effectiveness = get_di_effectiveness_array(angles, unique['x'], unique['y'])
+        if not sign:
+            effectiveness = np.abs(effectiveness)
+        out[start:start + chunk_size] = encode_heatmap(np.round(effectiveness, 4), out.dtype)[:, inverse_yx]
+    return out
+
+
+def encode_heatmap(heatmap, dtype):
+    """Takes in a heatmap of DI effectiveness and a dtype to store it with.
+    Float dtypes store the values directly. Integer dtypes store them in fixed point as multiples of
+    1 / HEATMAP_SCALE, which is exact for heatmaps rounded to 4 decimal places, so np.int16 uses a quarter of the
+    memory of np.float64 without losing precision.
+    """
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.integer):
+        return np.rint(np.asarray(heatmap) * HEATMAP_SCALE).astype(dtype)
+    return np.asarray(heatmap).astype(dtype, copy=False)
+
+
+def decode_heatmap(heatmap):
+    """Takes in a heatmap, or any part of a heatmap tensor, stored by encode_heatmap.
+    Returns the DI effectiveness values as float64.
+    """
+    heatmap = np.asarray(heatmap)
+    if np.issubdtype(heatmap.dtype, np.integer):
+        return heatmap / HEATMAP_SCALE
+    return heatmap.astype(np.float64)
+
+
+def _heatmap_angles_filename(filename):
+    """Returns the path of the file holding the knockback angles of the heatmap tensor saved in filename."""
+    return os.path.splitext(filename)[0] + '_angles.npy'
+
+
+def save_heatmap_tensor(filename, kb_angles, sign=False, dtype=np.int16, chunk_size=64):
+    """Calculates di_heatmap_tensor for kb_angles and saves it to filename as a .npy file, writing through a memory
+    map so that the whole tensor never has to fit in memory. With the default dtype of np.int16, a sweep at
+    0.1 degree resolution takes about 470 MB rather than 1.9 GB.
+    The knockback angles are saved alongside it, and both can be loaded with load_heatmap_tensor.
+    """
+    kb_angles = np.asarray(kb_angles, dtype=np.float64).ravel()
+    np.save(_heatmap_angles_filename(filename), kb_angles)
+    out = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype,
+                                    shape=(kb_angles.size, INPUT_SIZE, INPUT_SIZE))
+    di_heatmap_tensor(kb_angles, sign, out=out, chunk_size=chunk_size)
+    out.flush()
+    del out
+
+
+def load_heatmap_tensor(filename):
+    """Returns a tuple of 2 elements:
+    (the heatmap tensor saved by save_heatmap_tensor, memory mapped read-only, which decode_heatmap converts to floats,
+    the array of knockback angles for each heatmap in the tensor)
+    """
+    return np.load(filename, mmap_mode='r'), np.load(_heatmap_angles_filename(filename))
+
+
+def heatmap_tensor_filename(sign=False, step=1):
+    """Returns the path of the cached heatmap tensor from get_heatmap_tensor for the current INPUT_SIZE,
+    MAX_MAGNITUDE, DEAD_ZONE and MAX_DI.
+    """
+    name = f'di_heatmap_{"signed" if sign else "absolute"}_{step}_{INPUT_SIZE}_{MAX_MAGNITUDE}_{DEAD_ZONE}_{MAX_DI}.npy'
+    return os.path.join(CACHE_DIR, name)
+
+
+def get_heatmap_tensor(sign=False, step=1):
+    """Returns load_heatmap_tensor for a sweep of knockback angles from 0 up to 360 degrees every step degrees.
+    The tensor is saved with save_heatmap_tensor into CACHE_DIR the first time it is needed. It is written under a
+    unique temporary name and then moved into place, so that an interrupted build is never loaded and processes
+    building it at the same time never write to the same file.
+    """
+    filename = heatmap_tensor_filename(sign, step)
+    if not os.path.exists(filename):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp.npy')
+        os.close(fd)
+        try:
+            save_heatmap_tensor(temp_name, np.arange(0, 360, step), sign)
+            os.replace(_heatmap_angles_filename(temp_name), _heatmap_angles_filename(filename))
+            os.replace(temp_name, filename)
+        except BaseException:
+            for name in (temp_name, _heatmap_angles_filename(temp_name)):
+                if os.path.exists(name):
+                    os.remove(name)
+            raise
+    return load_heatmap_tensor(filename)
+
+
+def get_unique_input_polar():
+    """Returns a tuple of 2 read-only arrays with one element per distinct processed input, in the order of
+    get_unique_inputs. The first contains the angle of each input in degrees, or NaN for the neutral input,
+    and the second contains its magnitude as a proportion of MAX_MAGNITUDE.
+    """
+    global _unique_input_polar
+    if _unique_input_polar is None:
+        unique, _ = get_unique_inputs()
+        input_angle, input_mag = _input_polar(unique['x'], unique['y'])
+        input_angle.flags.writeable = False
+        input_mag.flags.writeable = False
+        _unique_input_polar = input_angle, input_mag
+    return _unique_input_polar
+
+
+def get_optimal_di_batch(kb_angles, chunk_size=256):
+    """Takes in an array of knockback angles.
+    Returns a tuple of 4 arrays, each with one element per knockback angle:
+    (the raw inputs (x, y) giving the maximum clockwise DI as an N by 2 array,
+    the angle changes from get_di_angle_change for those inputs,
+    the raw inputs giving the maximum anticlockwise DI,
+    the angle changes for those inputs)
+    Where several distinct inputs give the same DI, the one with the first raw input is returned.
+    """
+    kb_angles = np.asarray(kb_angles, dtype=np.float64).ravel()
+    unique, _ = get_unique_inputs()
+    raw = np.stack((unique['raw_x'], unique['raw_y']), axis=-1)
+    input_angle, input_mag = get_unique_input_polar()
+    clockwise = np.empty(kb_angles.size, dtype=np.intp)
+    anticlockwise = np.empty(kb_angles.size, dtype=np.intp)
+    clockwise_change = np.empty(kb_angles.size)
+    anticlockwise_change = np.empty(kb_angles.size)
+    for start in range(0, kb_angles.size, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        effectiveness = _effectiveness_from_polar(kb_angles[chunk, np.newaxis], input_angle, input_mag)
+        rows = np.arange(effectiveness.shape[0])
+        clockwise[chunk] = np.argmax(effectiveness, axis=1)
+        anticlockwise[chunk] = np.argmin(effectiveness, axis=1)
+        clockwise_change[chunk] = effectiveness[rows, clockwise[chunk]] * MAX_DI
+        anticlockwise_change[chunk] = effectiveness[rows, anticlockwise[chunk]] * MAX_DI
+    return raw[clockwise], clockwise_change, raw[anticlockwise], anticlockwise_change
+
+
+def get_optimal_di(kb_angle):
+    """Takes in a knockback angle.
+    Returns a tuple of 2 elements, for the maximum clockwise DI and the maximum anticlockwise DI respectively.
+    Each is a tuple containing the raw input (x, y) and the angle change to the knockback from get_di_angle_change.
+    """
+    cw_raw, cw_change, acw_raw, acw_change = get_optimal_di_batch([kb_angle])
+    clockwise = (tuple(int(c) for c in cw_raw[0]), float(cw_change[0]))
+    anticlockwise = (tuple(int(c) for c in acw_raw[0]), float(acw_change[0]))
+    return clockwise, anticlockwise
+
+
+def build_angle_index(only_gate=False):
+    """Returns a structured numpy array with dtype ANGLE_INDEX_DTYPE containing one element for each distinct angle
+    of the processed inputs after dead zones, sorted by angle. The neutral input is not included.
+    Each element holds the largest processed input at that angle, and the first raw input that produces it.
+    If only_gate is True, only inputs that have been shortened by raw_to_melee are considered.
+    """
+    table = np.asarray(get_input_table()).ravel()
+    raw_index = np.arange(table.size)
+    keep = (table['x'] != 0) | (table['y'] != 0)
+    if only_gate:
+        keep &= table['rescaled']
+    table = table[keep]
+    raw_index = raw_index[keep]
+
+    x = table['x'].astype(np.int32)
+    y = table['y'].astype(np.int32)
+    divisor = np.gcd(x, y)
+    direction = (x // divisor + ORIGIN) * INPUT_SIZE + (y // divisor + ORIGIN)
+    # Sort by direction, then largest magnitude first, then first raw input, and keep the first of each direction
+    order = np.lexsort((raw_index, -(x ** 2 + y ** 2), direction))
+    first = order[np.r_[True, direction[order][1:] != direction[order][:-1]]]
+
+    index = np.zeros(first.size, dtype=ANGLE_INDEX_DTYPE)
+    index['x'] = table['x'][first]
+    index['y'] = table['y'][first]
+    index['angle'] = xy_to_angle_array(index['x'], index['y'])
+    index['raw_x'], index['raw_y'] = np.divmod(raw_index[first], INPUT_SIZE)
+    index['rescaled'] = table['rescaled'][first]
+    return np.sort(index, order='angle')
+
+
+def get_angle_index(only_gate=False):
+    """Returns the angle index from build_angle_index.
+    Each index is built the first time it is needed and kept for the rest of the process.
+    """
+    if only_gate not in _angle_indexes:
+        index = build_angle_index(only_gate)
+        index.flags.writeable = False
+        _angle_indexes[only_gate] = index
+    return _angle_indexes[only_gate]
+
+
+def angle_distance(a, b):
+    """Returns the absolute difference between angles a and b in degrees, going the shorter way around the circle."""
+    difference = np.mod(np.asarray(a) - b, 360)
+    return np.minimum(difference, 360 - difference)
+
+
+def nearest_input_angle(angle, only_gate=False):
+    """Takes in an angle in degrees, or an array of angles.
+    Returns the element(s) of the angle index for the achievable input angle closest to each angle, found by binary
+    search. If only_gate is True, only inputs that have been shortened by raw_to_melee are considered.
+    """
+    index = get_angle_index(only_gate)
+    angles = index['angle']
+    angle = np.mod(angle, 360)
+    above = np.searchsorted(angles, angle) % angles.size
+    below = (above - 1) % angles.size
+    use_below = angle_distance(angles[below], angle) < angle_distance(angles[above], angle)
+    return index[np.where(use_below, below, above)]
+
+
+def inputs_near_angle(angle, tolerance, only_gate=False):
+    """Takes in an angle and a tolerance, both in degrees.
+    Returns the elements of the angle index whose angle is within tolerance of the given angle, sorted by angle and
+    found by binary search. If only_gate is True, only inputs that have been shortened by raw_to_melee are considered.
+    """
+    index = get_angle_index(only_gate)
+    angles = index['angle']
+    if tolerance >= 180:
+        return index
+    low = np.mod(angle - tolerance, 360)
+    high = np.mod(angle + tolerance, 360)
+    start = np.searchsorted(angles, low, side='left')
+    stop = np.searchsorted(angles, high, side='right')
+    if low <= high:
+        return index[start:stop]
+    return np.concatenate((index[start:], index[:stop]))
+
+
+def build_launch_angle_index(kb_angle):
+    """Takes in a knockback angle.
+    Returns a structured numpy array with dtype LAUNCH_ANGLE_INDEX_DTYPE containing one element for each distinct
+    processed input from get_unique_inputs, sorted by the knockback angle after that input's DI is applied.
+    """
+    unique, _ = get_unique_inputs()
+    index = np.zeros(unique.size, dtype=LAUNCH_ANGLE_INDEX_DTYPE)
+    index['angle_change'] = get_di_angle_change_array(kb_angle, unique['x'], unique['y'])
+    index['launch_angle'] = kb_angle + index['angle_change']
+    for field in ('x', 'y', 'raw_x', 'raw_y'):
+        index[field] = unique[field]
+    return np.sort(index, order='launch_angle', kind='stable')
+
+
+def _unwrap_launch_angle(index, launch_angle):
+    """Returns launch_angle shifted by a multiple of 360 degrees to be within 180 degrees of the middle of index."""
+    middle = (index['launch_angle'][0] + index['launch_angle'][-1]) / 2
+    return np.mod(np.asarray(launch_angle) - middle + 180, 360) + middle - 180
+
+
+def nearest_launch_angle(index, launch_angle):
+    """Takes in an index from build_launch_angle_index and a launch angle in degrees, or an array of them.
+    Returns the element(s) of the index whose launch angle is closest to each one, found by binary search.
+    """
+    angles = index['launch_angle']
+    launch_angle = _unwrap_launch_angle(index, launch_angle)
+    above = np.clip(np.searchsorted(angles, launch_angle), 1, angles.size - 1)
+    below = above - 1
+    use_below = np.abs(angles[below] - launch_angle) <= np.abs(angles[above] - launch_angle)
+    return index[np.where(use_below, below, above)]
+
+
+def inputs_near_launch_angle(index, launch_angle, tolerance=0):
+    """Takes in an index from build_launch_angle_index, a launch angle and a tolerance, both in degrees.
+    Returns the elements of the index whose launch angle is within tolerance of the given one, found by binary
+    search. With the default tolerance of 0 this is every input giving exactly that launch angle.
+    """
+    angles = index['launch_angle']
+    launch_angle = _unwrap_launch_angle(index, launch_angle)
+    start = np.searchsorted(angles, launch_angle - tolerance, side='left')
+    stop = np.searchsorted(angles, launch_angle + tolerance, side='right')
+    return index[start:stop]
+
+
+def _read_raw_log_chunks(filename, chunk_size):
+    """Yields arrays of shape (n, 2) of raw inputs from a stick log, at most chunk_size frames at a time.
+    A .csv file must have a header row with x and y columns. Any other file is read as binary, with one unsigned byte
+    for x followed by one for y on each frame, and is memory mapped rather than loaded.
+    """
+    if filename.endswith('.csv'):
+        with open(filename, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            columns = [header.index('x'), header.index('y')]
+            while True:
+                rows = list(itertools.islice(reader, chunk_size))
+                if not rows:
+                    return
+                yield np.array([[row[c] for c in columns] for row in rows], dtype=np.int64)
+    else:
+        size = os.path.getsize(filename)
+        if size % 2:
+            raise ValueError(f"Binary stick log {filename} has an odd number of bytes ({size}), so the last frame is "
+                             f"incomplete")
+        if size == 0:
+            return
+        raw = np.memmap(filename, dtype=np.uint8, mode='r').reshape(-1, 2)
+        for start in range(0, len(raw), chunk_size):
+            yield np.array(raw[start:start + chunk_size])
+
+
+def iter_stick_log(filename, kb_angle, chunk_size=65536):
+    """Takes in the path of a log of raw stick inputs with one input per frame, and a knockback angle.
+    The log is either a .csv file with a header row containing x and y columns, or a binary file with one unsigned
+    byte for x followed by one for y on each frame.
+    Yields structured numpy arrays with dtype STICK_LOG_DTYPE of at most chunk_size frames each, so that logs larger
+    than memory can be processed. Every frame is resolved through the input lookup table and per distinct input
+    tables, so no stick processing is repeated.
+    Raises ValueError if a raw input is outside 0 to 255, or if a binary log has an incomplete last frame.
+    """
+    table = get_input_table()
+    unique, inverse = get_unique_inputs()
+    input_angle, _ = get_unique_input_polar()
+    effectiveness = get_di_effectiveness_array(kb_angle, unique['x'], unique['y'])
+    frame = 0
+    for raw in _read_raw_log_chunks(filename, chunk_size):
+        out_of_range = np.flatnonzero(((raw < 0) | (raw >= INPUT_SIZE)).any(axis=1))
+        if out_of_range.size:
+            bad = out_of_range[0]
+            raise ValueError(f"Raw input {tuple(raw[bad].tolist())} on frame {frame + bad} of {filename} is outside "
+                             f"0 to {INPUT_SIZE - 1}")
+        raw_x, raw_y = raw[:, 0], raw[:, 1]
+        entries = table[raw_x, raw_y]
+        distinct = inverse[raw_x, raw_y]
+        chunk = np.zeros(len(raw), dtype=STICK_LOG_DTYPE)
+        chunk['frame'] = np.arange(frame, frame + len(raw))
+        chunk['raw_x'] = raw_x
+        chunk['raw_y'] = raw_y
+        chunk['x'] = entries['x']
+        chunk['y'] = entries['y']
+        chunk['dead_zone_x'] = (entries['x'] == 0) & (entries['melee_x'] != 0)
+        chunk['dead_zone_y'] = (entries['y'] == 0) & (entries['melee_y'] != 0)
+        chunk['angle'] = input_angle[distinct]
+        chunk['di_effectiveness'] = effectiveness[distinct]
+        frame += len(raw)
+        yield chunk
 
 
 def possible_inputs():
@@ -160,21 +593,27 @@ def possible_inputs():
      gets shortened down in the Melee representation of the input, or 1 otherwise.
      Creating an image from this array shows the shape of all possible inputs in the Melee representation.
      """
-    grid = np.zeros((INPUT_SIZE, INPUT_SIZE))
-    for x in range(INPUT_SIZE):
-        for y in range(INPUT_SIZE):
-            if (x-128)**2 + (y-128)**2 <= MAX_MAG_SQUARE:
-                grid[x, y] = 1
-    return grid
+    x, y = np.indices((INPUT_SIZE, INPUT_SIZE))
+    return ((x - 128) ** 2 + (y - 128) ** 2 <= MAX_MAG_SQUARE).astype(np.float64)
+
+
+def build_possible_inputs_colour():
+    """Returns a 256 by 256 by 4 uint8 RGBA image which is white wherever possible_inputs is 1 and transparent
+    elsewhere.
+    """
+    data_color = np.full((INPUT_SIZE, INPUT_SIZE, 4), 255, dtype=np.uint8)
+    data_color[..., 3] = possible_inputs() * 255
+    return data_color
+
+
+def possible_inputs_colour_filename():
+    """Returns the path of the cached possible_inputs_colour image for the current INPUT_SIZE and MAX_MAGNITUDE."""
+    return os.path.join(CACHE_DIR, f'possible_inputs_colour_{INPUT_SIZE}_{MAX_MAGNITUDE}.npy')
 
 
 def possible_inputs_colour():
-    data = possible_inputs()
-    data_color = np.ones((INPUT_SIZE, INPUT_SIZE, 4))
-    for i in range(INPUT_SIZE):
-        for j in range(INPUT_SIZE):
-            data_color[i, j, 3] = data[i, j]
-    return np.uint8(data_color * 255)
+    """Returns a new copy of the image from build_possible_inputs_colour, which is cached on disk in CACHE_DIR."""
+    return np.array(_load_cached_array(possible_inputs_colour_filename(), build_possible_inputs_colour))
 
 
 def process_raw_input(x, y):
@@ -186,6 +625,182 @@ def process_raw_input(x, y):
     return nx, ny
 
 
+def _split_xy(x, y):
+    """Takes in either two arrays x and y, or a single array x of shape (..., 2) with y as None.
+    Returns a tuple containing the x and y arrays, and a boolean which is True if the input was a single stacked array.
+    """
+    if y is None:
+        xy = np.asarray(x)
+        if xy.shape[-1:] != (2,):
+            raise ValueError("A single input array must have shape (..., 2)")
+        return xy[..., 0], xy[..., 1], True
+    return np.asarray(x), np.asarray(y), False
+
+
+def _join_xy(x, y, stacked):
+    """Returns x and y stacked into an array of shape (..., 2) if stacked is True, or as a tuple otherwise."""
+    if stacked:
+        return np.stack((x, y), axis=-1)
+    return x, y
+
+
+def raw_to_melee_array(x, y=None):
+    """Array version of raw_to_melee.
+    Takes in either arrays x and y of raw stick coordinates between 0 and 255 inclusive, or a single array of
+    shape (..., 2) containing (x, y) pairs.
+    Returns the inputs converted to the integer Melee representation as int8 arrays, in the same form as the input.
+    Results are identical to calling raw_to_melee on each input.
+    """
+    x, y, stacked = _split_xy(x, y)
+    x_shift = x.astype(np.int64) - ORIGIN
+    y_shift = y.astype(np.int64) - ORIGIN
+    magnitude_squared = x_shift ** 2 + y_shift ** 2
+    outside = magnitude_squared > MAX_MAG_SQUARE
+    magnitude = np.sqrt(np.where(outside, magnitude_squared, 1))
+    # int() truncates towards zero, which np.trunc also does for negative coordinates
+    x_out = np.where(outside, np.trunc(x_shift * MAX_MAGNITUDE / magnitude), x_shift).astype(np.int8)
+    y_out = np.where(outside, np.trunc(y_shift * MAX_MAGNITUDE / magnitude), y_shift).astype(np.int8)
+    return _join_xy(x_out, y_out, stacked)
+
+
+def apply_dead_zone_array(x, y=None):
+    """Array version of apply_dead_zone.
+    Takes in either arrays x and y in the integer Melee representation, or a single array of shape (..., 2).
+    Returns int8 arrays with the dead zones for each axis applied, in the same form as the input.
+    """
+    x, y, stacked = _split_xy(x, y)
+    dead_zone_size = DEAD_ZONE
+    x_out = np.where(np.abs(x) < dead_zone_size, 0, x).astype(np.int8)
+    y_out = np.where(np.abs(y) < dead_zone_size, 0, y).astype(np.int8)
+    return _join_xy(x_out, y_out, stacked)
+
+
+def process_raw_input_array(x, y=None):
+    """Array version of process_raw_input.
+    Takes in either arrays x and y of raw stick coordinates, or a single array of shape (..., 2).
+    Returns int8 arrays in the integer Melee representation after dead zones are applied, in the same form as the input.
+    """
+    x, y, stacked = _split_xy(x, y)
+    nx, ny = raw_to_melee_array(x, y)
+    nx, ny = apply_dead_zone_array(nx, ny)
+    return _join_xy(nx, ny, stacked)
+
+
+def build_input_table():
+    """Returns a 256 by 256 structured numpy array with dtype INPUT_TABLE_DTYPE, where the [x, y] indexed element
+    holds the processing of the raw input (x, y): the Melee representation before and after dead zones, and whether
+    the input was shortened by raw_to_melee.
+    """
+    raw_x, raw_y = np.indices((INPUT_SIZE, INPUT_SIZE))
+    table = np.zeros((INPUT_SIZE, INPUT_SIZE), dtype=INPUT_TABLE_DTYPE)
+    table['melee_x'], table['melee_y'] = raw_to_melee_array(raw_x, raw_y)
+    table['x'], table['y'] = apply_dead_zone_array(table['melee_x'], table['melee_y'])
+    table['rescaled'] = (raw_x - ORIGIN) ** 2 + (raw_y - ORIGIN) ** 2 > MAX_MAG_SQUARE
+    return table
+
+
+def input_table_filename():
+    """Returns the path of the cached input table for the current INPUT_SIZE, MAX_MAGNITUDE and DEAD_ZONE."""
+    name = f'input_table_{INPUT_SIZE}_{MAX_MAGNITUDE}_{DEAD_ZONE}.npy'
+    return os.path.join(CACHE_DIR, name)
+
+
+def _save_cached_array(filename, array):
+    """Saves array to filename as a .npy file. The file is written under a temporary name and then moved into place,
+    so that other processes never load a partially written file.
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(temp_name, filename)
+    except BaseException:
+        os.remove(temp_name)
+        raise
+
+
+def _load_cached_array(filename, build):
+    """Returns the array stored in filename, memory mapped read-only.
+    If the file does not exist it is created by calling build. If the cache directory cannot be written to,
+    the built array is returned directly instead.
+    """
+    if not os.path.exists(filename):
+        array = build()
+        try:
+            _save_cached_array(filename, array)
+        except OSError:
+            array.flags.writeable = False
+            return array
+    return np.load(filename, mmap_mode='r')
+
+
+def get_input_table():
+    """Returns the input table from build_input_table.
+    The table is built the first time it is needed and cached on disk in CACHE_DIR, then memory mapped so that every
+    process shares a single copy.
+    """
+    global _input_table
+    if _input_table is None:
+        _input_table = _load_cached_array(input_table_filename(), build_input_table)
+    return _input_table
+
+
+def build_unique_inputs():
+    """Returns a tuple of 2 elements describing the distinct processed inputs, after dead zones, that raw inputs
+    can produce.
+    The first is a structured numpy array with dtype UNIQUE_INPUT_DTYPE containing each distinct processed input once,
+    in order of the first raw input (x, y) that produces it.
+    The second is a 256 by 256 integer array where the [x, y] element is the index into the first array of the
+    processed input for the raw input (x, y).
+    """
+    table = np.asarray(get_input_table()).ravel()
+    key = (table['x'].astype(np.int32) + ORIGIN) * INPUT_SIZE + (table['y'].astype(np.int32) + ORIGIN)
+    _, first, inverse, counts = np.unique(key, return_index=True, return_inverse=True, return_counts=True)
+    order = np.argsort(first)  # Order the distinct inputs by their first raw input rather than by key
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    first = first[order]
+
+    unique = np.zeros(first.size, dtype=UNIQUE_INPUT_DTYPE)
+    unique['x'] = table['x'][first]
+    unique['y'] = table['y'][first]
+    unique['raw_x'], unique['raw_y'] = np.divmod(first, INPUT_SIZE)
+    unique['count'] = counts[order]
+    inverse = rank[inverse.ravel()].reshape((INPUT_SIZE, INPUT_SIZE))
+    return unique, inverse
+
+
+def get_unique_inputs():
+    """Returns the distinct processed inputs and the inverse map from build_unique_inputs.
+    These are built the first time they are needed and kept for the rest of the process.
+    """
+    global _unique_inputs
+    if _unique_inputs is None:
+        unique, inverse = build_unique_inputs()
+        unique.flags.writeable = False
+        inverse.flags.writeable = False
+        _unique_inputs = unique, inverse
+    return _unique_inputs
+
+
+def unique_to_grid(values):
+    """Takes in an array whose last axis has one value per distinct processed input, in the order of
+    get_unique_inputs.
+    Returns an array where that axis is replaced by two axes of length 256, so that the [..., x, y] element is the
+    value for the raw input (x, y).
+    """
+    _, inverse = get_unique_inputs()
+    return np.asarray(values)[..., inverse]
+
+
+def lookup_raw_input(x, y):
+    """Takes in raw inputs x and y, which can be integers or integer arrays between 0 and 255 inclusive.
+    Returns the matching element(s) of the input table, which have fields melee_x, melee_y, x, y and rescaled.
+    """
+    return get_input_table()[x, y]
+
+
 def get_kb_line_points(kb_angle):
     """Takes in a knockback angle and returns a tuple of lists.
     The first list is x coordinates and the second is y coordinates. When plotted against each other this represents a
@@ -284,16 +899,13 @@ def count_angles(only_gate=False):
     in Melee when dead zones are considered.
     If only_gate is True, only inputs that have been shortened by raw_to_melee are considered.
     """
-    tans = set()
-    for x in range(ORIGIN):
-        for y in range(ORIGIN):
-            x1, y1 = raw_to_melee(x, y)
-            x2, y2 = apply_dead_zone(x1, y1)
-            if (not only_gate) or (only_gate and (x-128)**2 + (y-128)**2 >= MAX_MAG_SQUARE):
-                if x2 == 0:
-                    pass
-                else:
-                    tans.add(fractions.Fraction(y2, x2))
+    raw_x, raw_y = np.indices((ORIGIN, ORIGIN))
+    quadrant = np.asarray(get_input_table())[:ORIGIN, :ORIGIN]
+    keep = quadrant['x'] != 0
+    if only_gate:
+        keep &= (raw_x - 128) ** 2 + (raw_y - 128) ** 2 >= MAX_MAG_SQUARE
+    pairs = np.unique(np.stack((quadrant['x'][keep], quadrant['y'][keep]), axis=-1), axis=0)
+    tans = set(fractions.Fraction(int(y2), int(x2)) for x2, y2 in pairs)
     num_angles = len(tans) * 4
     return tans, num_angles
 
@@ -0,0 +1,124 @@
+"""Regression checks that the vectorized stick and physics functions still match the scalar, frame by frame and linear
+scan versions they replaced. Run with python -m pytest test_regression.py, or directly with python.
+"""
+import numpy as np
+import melee_physics
+import stick_and_di
+
+HEATMAP_ANGLES = (0, 45, 90, 135, 180, 225, 300, 359.5)
+PATH_HITS = ((45, 80, 1.8, 0.1, (0, 0)),
+             (45, 150, 2.8, 0.23, (60, -40)),
+             (361, 120, 1.5, 0.1, (-80, 0)),
+             (270, 60, 1.9, 0.13, (23, 23)),
+             (135, 200, 2.5, 0.2, (-50, 62)),
+             (300, 95, 1.6, 0.064, (0, -80)))
+KILL_HITS = (({'kb_angle': 45, 'attack_dmg': 17, 'bkb': 70, 'kbg': 50}, melee_physics.FOX, (0, 0)),
+             ({'kb_angle': 45, 'attack_dmg': 17, 'bkb': 70, 'kbg': 50}, melee_physics.FOX, (-58, 55)),
+             ({'kb_angle': 80, 'attack_dmg': 13, 'bkb': 30, 'kbg': 110}, melee_physics.EXAMPLE_CHARACTER, (80, 0)),
+             ({'kb_angle': 361, 'attack_dmg': 9, 'bkb': 10, 'kbg': 100}, melee_physics.EXAMPLE_CHARACTER, (0, 0)))
+KILL_MAX_PERCENT = 300
+
+
+def loop_di_heatmap(kb_angle, sign=False):
+    """Returns di_heatmap(kb_angle, sign) calculated one raw input at a time with the scalar stick functions."""
+    heatmap = np.zeros((stick_and_di.INPUT_SIZE, stick_and_di.INPUT_SIZE))
+    for x in range(stick_and_di.INPUT_SIZE):
+        for y in range(stick_and_di.INPUT_SIZE):
+            heatmap[y, x] = stick_and_di.get_di_effectiveness(kb_angle, *stick_and_di.process_raw_input(x, y))
+    if not sign:
+        heatmap = np.abs(heatmap)
+    return np.round(heatmap, 4)
+
+
+def loop_get_path(kb_angle, kb_strength, fall_speed, gravity, di=(0, 0)):
+    """Returns get_path(kb_angle, kb_strength, fall_speed, gravity, di) simulated one frame at a time."""
+    kb_angle_di = kb_angle + stick_and_di.get_di_angle_change(kb_angle, *di)
+    unit = np.exp(np.deg2rad(kb_angle_di) * 1j)
+    decay = 0.051 * unit
+    gravity_frames = int(fall_speed / gravity)
+    last_gravity_frame = fall_speed % gravity
+    position = 0 + 0j
+    fall_velocity = 0 + 0j
+    kb_vel_start = kb_strength * 0.03 * unit
+    kb_vel = kb_vel_start
+    positions = [position]
+    for i in range(int(kb_strength * 0.4)):
+        kb_vel -= decay
+        if np.sign(kb_vel.real) != np.sign(kb_vel_start.real):
+            kb_vel = kb_vel.imag * 1j
+        if np.sign(kb_vel.imag) != np.sign(kb_vel_start.imag):
+            kb_vel = kb_vel.real
+        if i < gravity_frames:
+            fall_velocity -= gravity * 1j
+        elif i == gravity_frames:
+            fall_velocity -= last_gravity_frame * 1j
+        position += fall_velocity + kb_vel
+        positions.append(position)
+    return np.array(positions)
+
+
+def linear_kill_percent(hitbox, character, di, stage=melee_physics.EXAMPLE_STAGE, max_percent=KILL_MAX_PERCENT):
+    """Returns get_kill_percent for a hit by trying every percent from 0 upwards, or None if it never kills."""
+    for percent in range(max_percent + 1):
+        kb_strength = melee_physics.get_knockback(percent, character['weight'], hitbox['attack_dmg'],
+                                                  hitbox['bkb'], hitbox['kbg'])
+        path = loop_get_path(hitbox['kb_angle'], kb_strength, character['fall_speed'], character['gravity'], di)
+        if melee_physics.crosses_blast_zone(path, stage):
+            return percent
+    return None
+
+
+def test_stick_processing_matches_scalar():
+    x, y = np.indices((stick_and_di.INPUT_SIZE, stick_and_di.INPUT_SIZE))
+    melee_x, melee_y = stick_and_di.raw_to_melee_array(x, y)
+    dead_zone_x, dead_zone_y = stick_and_di.apply_dead_zone_array(melee_x, melee_y)
+    processed_x, processed_y = stick_and_di.process_raw_input_array(x, y)
+    table = stick_and_di.get_input_table()
+    for raw_x in range(stick_and_di.INPUT_SIZE):
+        for raw_y in range(stick_and_di.INPUT_SIZE):
+            melee = stick_and_di.raw_to_melee(raw_x, raw_y)
+            dead_zone = stick_and_di.apply_dead_zone(*melee)
+            assert (melee_x[raw_x, raw_y], melee_y[raw_x, raw_y]) == melee
+            assert (dead_zone_x[raw_x, raw_y], dead_zone_y[raw_x, raw_y]) == dead_zone
+            assert (processed_x[raw_x, raw_y], processed_y[raw_x, raw_y]) == dead_zone
+            assert (table[raw_x, raw_y]['x'], table[raw_x, raw_y]['y']) == dead_zone
+
+
+def test_di_heatmap_matches_loop():
+    for kb_angle in HEATMAP_ANGLES:
+        signed = loop_di_heatmap(kb_angle, sign=True)
+        assert np.array_equal(stick_and_di.di_heatmap(kb_angle, sign=True), signed), kb_angle
+        assert np.array_equal(stick_and_di.di_heatmap(kb_angle), np.abs(signed)), kb_angle
+
+
+def test_get_path_matches_loop():
+    for hit in PATH_HITS:
+        kb_angle, kb_strength, fall_speed, gravity, di = hit
+        path = loop_get_path(*hit)
+        assert np.array_equal(melee_physics.get_path(*hit), path), hit
+        paths, hit_stun = melee_physics.get_paths(kb_angle, kb_strength, fall_speed, gravity, di[0], di[1])
+        assert hit_stun[0] == len(path) - 1
+        assert np.allclose(paths[0, :len(path)], path, rtol=1e-12, atol=1e-12), hit
+        assert np.isnan(paths[0, len(path):]).all()
+        frames = np.arange(len(path) + 2)
+        positions, _ = melee_physics.get_position_at_frame(frames, kb_angle, kb_strength, fall_speed, gravity, *di)
+        assert np.allclose(positions[:len(path)], path, rtol=1e-9, atol=1e-9), hit
+        assert np.isnan(positions[len(path):]).all()
+
+
+def test_kill_percent_matches_linear_scan():
+    for hitbox, character, di in KILL_HITS:
+        expected = linear_kill_percent(hitbox, character, di)
+        assert melee_physics.get_kill_percent(**hitbox, **character, di=di,
+                                              max_percent=KILL_MAX_PERCENT) == expected, (hitbox, di)
+
+
+def main():
+    for name, check in list(globals().items()):
+        if name.startswith('test_'):
+            check()
+            print(name, 'passed')
+
+
+if __name__ == '__main__':
+    main()